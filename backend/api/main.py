@@ -6,41 +6,93 @@ import sys
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
+    UVICORN_LOOP = "auto"
+else:
+    # Prefer libuv-based event loop on Linux/macOS when available
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        UVICORN_LOOP = "uvloop"
+    except ImportError:
+        UVICORN_LOOP = "auto"
+
+import json
+import hashlib
+import importlib.util
+import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from .routes import chat, health, ingestion
-import os
 from dotenv import load_dotenv
-import logging
 
-# Load environment variables
+# Load environment variables before any route/service module reads them
 load_dotenv()
 
+from fastapi import FastAPI, Request
+from backend.utils.config import config
+from .middleware import FastCORSMiddleware
+from .responses import DefaultResponse, NATIVE_JSON_SERIALIZATION
+from .routes import chat, health, ingestion
+
+
+def _iter_route_keys(routes, prefix=""):
+    """Yield (method, path) for every route, descending into included routers."""
+    for route in routes:
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            # Newer FastAPI keeps included routers nested instead of copying routes
+            yield from _iter_route_keys(included.routes, prefix + route.include_context.prefix)
+            continue
+        for method in getattr(route, "methods", None) or ():
+            yield method, prefix + route.path
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan: startup and shutdown logic."""
+    """Application lifespan: the single place for startup and shutdown logic."""
     # --- Startup ---
+    from backend.utils.logger import enable_queue_logging, disable_queue_logging
+    enable_queue_logging()
+
     logger = logging.getLogger("uvicorn")
     logger.info("%s", "=" * 60)
     logger.info("Starting Web Crawler Chatbot API")
-    logger.info("Environment: %s", os.getenv('ENVIRONMENT', 'development'))
-    logger.info("API Docs: http://localhost:%s/docs", os.getenv('API_PORT', '8000'))
-    logger.info("Vector Store: %s", os.getenv('VECTOR_STORE_TYPE', 'chroma'))
-    logger.info("LLM Provider: %s", os.getenv('LLM_PROVIDER', 'groq'))
+    logger.info("Environment: %s", config.ENVIRONMENT)
+    logger.info("API Docs: http://localhost:%s/docs", config.API_PORT)
+    logger.info("Vector Store: %s", config.VECTOR_DB_TYPE)
+    logger.info("LLM Provider: %s", config.LLM_PROVIDER)
+
+    # Catch accidental double include_router() calls, which would register
+    # (and dispatch-scan) the same routes twice
+    seen = set()
+    for key in _iter_route_keys(app.routes):
+        if key in seen:
+            logger.warning("Route registered more than once: %s %s", *key)
+        seen.add(key)
 
     # Try to connect to database (optional)
     try:
-        from backend.services.db import get_db, use_fake_db
+        from backend.services.db import get_db, use_fake_db, ensure_indexes
         if use_fake_db():
             logger.info("Database: In-memory (USE_FAKE_DB=1)")
         else:
-            db = get_db()
+            ensure_indexes(get_db())
             logger.info("Database: MongoDB connected")
     except Exception as e:
-        logger.warning("Database not available: %s (using in-memory)", e)
+        logger.warning("Database not available: %s (will retry on first request)", e)
+
+    # Warm the chat orchestrator so the first request doesn't pay for
+    # service construction and embedding model loading
+    try:
+        orch = chat.get_orchestrator()
+        if orch.embedding_service.provider == "local":
+            from backend.services.embeddings import get_local_model
+            get_local_model()
+        logger.info("Chat orchestrator: ready")
+    except Exception as e:
+        logger.warning("Chat orchestrator warm-up failed: %s (will retry on first request)", e)
+
+    # Load the tokenizer once so the first ingestion job doesn't pay for it
+    from backend.data_ingestion.chunker import get_encoding
+    get_encoding()
 
     logger.info("%s", "=" * 60)
 
@@ -48,7 +100,30 @@ async def lifespan(app: FastAPI):
 
     # --- Shutdown ---
     logger.info("Shutting down chatbot API...")
+    from backend.services.db import close_mongo_client
+    close_mongo_client()
+
+    from backend.services.cache import close_redis
+    close_redis()
+
+    from backend.api.routes.ingestion import shutdown_job_loop
+    shutdown_job_loop()
+
+    from backend.services.embedding_cache import close as close_embedding_cache
+    close_embedding_cache()
+
+    from backend.data_ingestion.pipeline import shutdown_extraction_pool
+    shutdown_extraction_pool()
+
+    from backend.services.llm_service import close_http_client
+    close_http_client()
+
+    disable_queue_logging()
+
 
+# A custom default response class would opt every route out of FastAPI's
+# native bytes serialization, so it is only set on releases without it
+_response_options = {} if NATIVE_JSON_SERIALIZATION else {"default_response_class": DefaultResponse}
 
 app = FastAPI(
     title="Web Crawler Chatbot API",
@@ -56,15 +131,15 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    **_response_options
 )
 
 # CORS Configuration
-_cors_env = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:8000,http://localhost:5173")
-origins = [o.strip() for o in _cors_env.split(",")]
+origins = list(config.CORS_ORIGIN_LIST)
 _allow_all_origins = "*" in origins
 app.add_middleware(
-    CORSMiddleware,
+    FastCORSMiddleware,
     allow_origins=["*"] if _allow_all_origins else origins,
     allow_credentials=False if _allow_all_origins else True,
     allow_methods=["*"],
@@ -76,24 +151,33 @@ app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(ingestion.router, prefix="/api", tags=["ingestion"])
 
-# Optional: Include auth and clients routers if auth is enabled
-try:
-    from .routes import auth, clients
-    app.include_router(auth.router, prefix="/api", tags=["auth"])
-    app.include_router(clients.router, prefix="/api", tags=["clients"])
-except ImportError:
-    pass
+# Optional: Include auth and clients routers if auth is enabled and its
+# dependencies are installed (checked without importing them)
+if config.ENABLE_AUTH:
+    if all(importlib.util.find_spec(dep) is not None for dep in ("jose", "bcrypt", "bson")):
+        from .routes import auth, clients
+        app.include_router(auth.router, prefix="/api", tags=["auth"])
+        app.include_router(clients.router, prefix="/api", tags=["clients"])
+    else:
+        logging.getLogger(__name__).warning("Auth routes disabled: python-jose, bcrypt or pymongo not installed")
+
+
+_ROOT_BODY = json.dumps({
+    "message": "Web Crawler Chatbot API",
+    "version": "1.0.0",
+    "docs": "/docs",
+    "health": "/api/health"
+}).encode()
+_ROOT_HEADERS = {
+    "Cache-Control": "max-age=60",
+    "ETag": '"%s"' % hashlib.sha1(_ROOT_BODY).hexdigest()
+}
 
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint."""
-    return {
-        "message": "Web Crawler Chatbot API",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "health": "/api/health"
-    }
+    return health.static_json_response(request, _ROOT_BODY, _ROOT_HEADERS)
 
 
 if __name__ == "__main__":
@@ -101,7 +185,8 @@ if __name__ == "__main__":
 
     uvicorn.run(
         "main:app",
-        host=os.getenv("API_HOST", "0.0.0.0"),
-        port=int(os.getenv("API_PORT", "8000")),
-        reload=os.getenv("RELOAD", "False").lower() == "true"
+        host=config.API_HOST,
+        port=config.API_PORT,
+        reload=config.RELOAD,
+        loop=UVICORN_LOOP
     )
@@ -0,0 +1,31 @@
+"""
+Custom ASGI middleware.
+"""
+from starlette.middleware.cors import CORSMiddleware
+from starlette.types import Receive, Scope, Send
+
+
+class FastCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware with O(1) origin lookups and a no-Origin fast path."""
+
+    def __init__(self, app, allow_origins=(), **kwargs):
+        super().__init__(app, allow_origins=allow_origins, **kwargs)
+        self.allowed = frozenset(self.allow_origins)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        if self.allow_all_origins:
+            return True
+
+        if self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(origin):
+            return True
+
+        return origin in self.allowed
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Same-origin and server-to-server requests carry no Origin header;
+        # pass them straight through without building a Headers object.
+        if scope["type"] != "http" or not any(k == b"origin" for k, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        await super().__call__(scope, receive, send)
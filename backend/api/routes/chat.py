@@ -1,38 +1,80 @@
 """
 Chat API endpoints.
 """
-from fastapi import APIRouter, HTTPException, Header
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
 import uuid
-import os
+import time
 import logging
+import threading
 
 from backend.services.chatbot_orchestrator import ChatbotOrchestrator
+from backend.api.responses import DefaultResponse
 from backend.services.db import get_db
+from backend.utils.timestamps import utc_now_iso
+
+try:
+    import orjson
+
+    def _sse(event: dict) -> bytes:
+        return b"data: " + orjson.dumps(event) + b"\n\n"
+except ImportError:
+    import json
+
+    def _sse(event: dict) -> bytes:
+        return f"data: {json.dumps(event)}\n\n".encode()
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize orchestrator (singleton pattern)
+# Initialize orchestrator (singleton pattern).
+# Warmed during app startup (see lifespan in main.py); built lazily otherwise.
 orchestrator = None
+_orchestrator_lock = threading.Lock()
 
 
 def get_orchestrator():
     """Get or create orchestrator instance."""
     global orchestrator
     if orchestrator is None:
-        orchestrator = ChatbotOrchestrator()
+        with _orchestrator_lock:
+            if orchestrator is None:
+                orchestrator = ChatbotOrchestrator()
     return orchestrator
 
 
+# Cached system prompt from the settings collection, refreshed at most once
+# per SETTINGS_CACHE_TTL seconds and invalidated when settings are updated.
+SETTINGS_CACHE_TTL = 60
+_system_prompt_cache = {"value": None, "expires_at": 0.0}
+
+
+def _load_system_prompt() -> Optional[str]:
+    """Read the system prompt from the DB and refresh the cache."""
+    settings = get_db().settings.find_one({"key": "chat_settings"}) or {}
+    _system_prompt_cache["value"] = settings.get("system_prompt")
+    _system_prompt_cache["expires_at"] = time.monotonic() + SETTINGS_CACHE_TTL
+    return _system_prompt_cache["value"]
+
+
+async def _get_system_prompt() -> Optional[str]:
+    """Return the system prompt, only hitting the DB when the cache is stale."""
+    if time.monotonic() < _system_prompt_cache["expires_at"]:
+        return _system_prompt_cache["value"]
+    return await run_in_threadpool(_load_system_prompt)
+
+
 # Request/Response Models
 class ChatMessage(BaseModel):
     role: str = Field(..., description="Message role (user or assistant)")
     content: str = Field(..., description="Message content")
 
+    model_config = ConfigDict(frozen=True)
+
 
 class ChatRequest(BaseModel):
     message: str = Field(..., description="User message", min_length=1)
@@ -40,17 +82,16 @@ class ChatRequest(BaseModel):
     conversation_history: Optional[List[ChatMessage]] = Field(None, description="Previous conversation messages")
     client_id: Optional[str] = Field(None, description="Client ID for tenant isolation (optional)")
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "message": "What are your pricing plans?",
-                "session_id": "123e4567-e89b-12d3-a456-426614174000",
-                "conversation_history": [
-                    {"role": "user", "content": "Hello"},
-                    {"role": "assistant", "content": "Hi! How can I help you?"}
-                ]
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "message": "What are your pricing plans?",
+            "session_id": "123e4567-e89b-12d3-a456-426614174000",
+            "conversation_history": [
+                {"role": "user", "content": "Hello"},
+                {"role": "assistant", "content": "Hi! How can I help you?"}
+            ]
         }
+    })
 
 
 class Source(BaseModel):
@@ -70,7 +111,7 @@ class SettingsRequest(BaseModel):
     system_prompt: str
 
 
-@router.post("/chat", response_model=ChatResponse)
+@router.post("/chat", response_model=None, responses={200: {"model": ChatResponse}})
 async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)):
     """
     Process chat message and return AI-generated response.
@@ -94,71 +135,101 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
             except Exception:
                 pass
 
-        # Load system prompt from settings
-        db = get_db()
-        settings = db.settings.find_one({"key": "chat_settings"}) or {}
-        system_prompt = settings.get("system_prompt")
-
-        # Process query
+        # Process query; the (cached) system prompt loads while retrieval runs
         result = await orch.process_query(
             query=request.message,
             session_id=session_id,
-            conversation_history=[msg.model_dump() for msg in request.conversation_history] if request.conversation_history else None,
+            conversation_history=request.model_dump(include={"conversation_history"})["conversation_history"],
             client_id=client_id,
-            system_prompt=system_prompt
+            system_prompt=_get_system_prompt()
         )
         
-        # Format sources
+        # Format sources (plain dicts: the payload is server-built, so it
+        # is serialized directly instead of being re-validated)
         sources = [
-            Source(url=s.get("url", ""), title=s.get("title", "")) 
+            {"url": s.get("url", ""), "title": s.get("title", "")}
             for s in result.get("sources", [])
         ]
         
         # Save session to DB (chat history)
-        timestamp = datetime.utcnow().isoformat()
-        
-        # Get existing history to append to
-        current_history = []
-        if request.conversation_history:
-            current_history = [msg.model_dump() for msg in request.conversation_history]
-            
-        current_history.append({"role": "user", "content": request.message})
-        current_history.append({"role": "assistant", "content": result["response"]})
-        
-        session_doc = {
-            "session_id": session_id,
-            "last_message": request.message,
-            "updated_at": timestamp,
-            "messages": current_history
-        }
-        
-        # Upsert session
-        db.chat_sessions.update_one(
-            {"session_id": session_id},
-            {"$set": session_doc},
-            upsert=True
-        )
+        timestamp = utc_now_iso()
+        await _save_turn(session_id, request.message, result["response"], timestamp)
 
-        return ChatResponse(
-            response=result["response"],
-            sources=sources,
-            session_id=session_id,
-            context_used=result.get("context_used", False),
-            timestamp=timestamp + "Z"
-        )
+        return DefaultResponse(content={
+            "response": result["response"],
+            "sources": sources,
+            "session_id": session_id,
+            "context_used": result.get("context_used", False),
+            "timestamp": timestamp
+        })
         
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in chat endpoint")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing chat message: {str(e)}"
         )
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Stream an AI-generated response as server-sent events.
+
+    Emits a `sources` event, then `token` events as the answer is generated,
+    then `done` once the turn is saved to the chat history.
+    """
+    orch = get_orchestrator()
+    session_id = request.session_id or str(uuid.uuid4())
+
+    async def events():
+        parts = []
+        try:
+            async for event in orch.process_query_stream(
+                query=request.message,
+                session_id=session_id,
+                conversation_history=request.model_dump(include={"conversation_history"})["conversation_history"],
+                client_id=request.client_id,
+                system_prompt=_get_system_prompt()
+            ):
+                if event["type"] == "token":
+                    parts.append(event["text"])
+                yield _sse(event)
+
+            timestamp = utc_now_iso()
+            await _save_turn(session_id, request.message, "".join(parts), timestamp)
+            yield _sse({"type": "done", "session_id": session_id, "timestamp": timestamp})
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.exception("Error in chat stream")
+            yield _sse({"type": "error", "detail": f"Error processing chat message: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _save_turn(session_id: str, message: str, response: str, timestamp: str):
+    """Append one user/assistant exchange to the stored history in a single atomic upsert."""
+    db = get_db()
+    await run_in_threadpool(
+        db.chat_sessions.update_one,
+        {"session_id": session_id},
+        {
+            "$set": {"last_message": message, "updated_at": timestamp},
+            "$push": {"messages": {"$each": [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": response},
+            ]}},
+        },
+        upsert=True
+    )
+
+
 @router.get("/chat/stats")
-async def get_stats():
+def get_stats():
     """
     Get chatbot statistics.
     """
@@ -177,35 +248,45 @@ async def get_stats():
 
         return {
             "stats": stats,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": utc_now_iso()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/chat/sessions")
-async def get_chat_sessions():
-    """Get list of chat sessions."""
+def get_chat_sessions(
+    limit: int = Query(50, ge=1, le=200, description="Maximum sessions to return"),
+    skip: int = Query(0, ge=0, description="Number of sessions to skip")
+):
+    """Get list of chat sessions, most recently updated first."""
     db = get_db()
-    sessions = list(db.chat_sessions.find())
-    # Sort by updated_at desc
-    sessions.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-    
-    return {
+    # Sorted via the updated_at index; message_count is computed server-side
+    # so the message arrays are never sent over the wire.
+    projection = {
+        "_id": 0,
+        "session_id": 1,
+        "last_message": 1,
+        "updated_at": 1,
+        "message_count": {"$size": {"$ifNull": ["$messages", []]}},
+    }
+    cursor = db.chat_sessions.find({}, projection).sort("updated_at", -1).skip(skip).limit(limit)
+
+    return DefaultResponse(content={
         "sessions": [
             {
                 "session_id": s.get("session_id"),
                 "last_message": s.get("last_message"),
                 "updated_at": s.get("updated_at"),
-                "message_count": len(s.get("messages", []))
+                "message_count": s.get("message_count", 0)
             }
-            for s in sessions
+            for s in cursor
         ]
-    }
+    })
 
 
 @router.get("/chat/sessions/{session_id}")
-async def get_chat_session(session_id: str):
+def get_chat_session(session_id: str):
     """Get specific chat session details."""
     db = get_db()
     session = db.chat_sessions.find_one({"session_id": session_id})
@@ -220,7 +301,7 @@ async def get_chat_session(session_id: str):
 
 
 @router.delete("/chat/sessions/{session_id}", status_code=204)
-async def delete_chat_session(session_id: str):
+def delete_chat_session(session_id: str):
     """Delete a chat session."""
     db = get_db()
     db.chat_sessions.delete_one({"session_id": session_id})
@@ -228,7 +309,7 @@ async def delete_chat_session(session_id: str):
 
 
 @router.get("/chat/settings")
-async def get_chat_settings():
+def get_chat_settings():
     """Get chat settings (system prompt)."""
     db = get_db()
     settings = db.settings.find_one({"key": "chat_settings"}) or {}
@@ -238,7 +319,7 @@ async def get_chat_settings():
 
 
 @router.post("/chat/settings")
-async def update_chat_settings(request: SettingsRequest):
+def update_chat_settings(request: SettingsRequest):
     """Update chat settings."""
     db = get_db()
     db.settings.update_one(
@@ -246,4 +327,5 @@ async def update_chat_settings(request: SettingsRequest):
         {"$set": {"system_prompt": request.system_prompt}},
         upsert=True
     )
+    _system_prompt_cache["expires_at"] = 0.0
     return {"status": "updated"}
@@ -3,35 +3,34 @@ Client management API endpoints (Super Admin only).
 """
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List
+from pydantic import TypeAdapter
 from datetime import datetime
 from bson import ObjectId
 import logging
 
-from backend.models.client import ClientCreate, ClientUpdate, ClientOut, RAGConfig
-from backend.services.auth import require_superadmin
+from backend.models.client import ClientCreate, ClientUpdate, ClientOut, DEFAULT_RAG_CONFIG
+from backend.services.auth import clear_token_cache, require_superadmin
 from backend.services.db import get_db
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Validates a whole client list in one pydantic-core call
+_CLIENT_LIST_ADAPTER = TypeAdapter(List[ClientOut])
+# Only fetch the fields ClientOut exposes
+_CLIENT_PROJECTION = {field: 1 for field in ClientOut.model_fields if field != "id"}
 
-def serialize_client(client_doc) -> dict:
-    """Convert MongoDB document to API response format."""
-    if not client_doc:
-        return None
-    
-    client_doc["id"] = str(client_doc.pop("_id"))
-    
-    # Ensure rag_config has all fields
-    if "rag_config" not in client_doc or not client_doc["rag_config"]:
-        client_doc["rag_config"] = RAGConfig().model_dump()
-    
-    return client_doc
+
+def valid_object_id(client_id: str) -> ObjectId:
+    """Path dependency that validates client_id without exception-driven control flow."""
+    if not ObjectId.is_valid(client_id):
+        raise HTTPException(status_code=400, detail="Invalid client ID format")
+    return ObjectId(client_id)
 
 
 @router.post("/clients", response_model=ClientOut)
-async def create_client(client: ClientCreate, user=Depends(require_superadmin)):
+def create_client(client: ClientCreate, user=Depends(require_superadmin)):
     """
     Create a new client (Super Admin only).
     """
@@ -46,7 +45,7 @@ async def create_client(client: ClientCreate, user=Depends(require_superadmin)):
     client_doc = {
         "name": client.name,
         "enl_id": client.enl_id,
-        "rag_config": client.rag_config.model_dump() if client.rag_config else RAGConfig().model_dump(),
+        "rag_config": client.rag_config.model_dump() if client.rag_config else dict(DEFAULT_RAG_CONFIG),
         "status": client.status,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
@@ -57,50 +56,41 @@ async def create_client(client: ClientCreate, user=Depends(require_superadmin)):
     result = db.clients.insert_one(client_doc)
     client_doc["_id"] = result.inserted_id
     
-    return ClientOut(**serialize_client(client_doc))
+    return ClientOut.model_validate(client_doc)
 
 
 @router.get("/clients", response_model=List[ClientOut])
-async def list_clients(user=Depends(require_superadmin)):
+def list_clients(user=Depends(require_superadmin)):
     """
     List all clients (Super Admin only).
     """
     db = get_db()
-    clients = list(db.clients.find().sort("created_at", -1))
-    
-    return [ClientOut(**serialize_client(c)) for c in clients]
+    docs = list(db.clients.find({}, _CLIENT_PROJECTION).sort("created_at", -1))
+    return _CLIENT_LIST_ADAPTER.validate_python(docs)
 
 
 @router.get("/clients/{client_id}", response_model=ClientOut)
-async def get_client(client_id: str, user=Depends(require_superadmin)):
+def get_client(obj_id: ObjectId = Depends(valid_object_id), user=Depends(require_superadmin)):
     """
     Get client details (Super Admin only).
     """
     db = get_db()
     
-    try:
-        client = db.clients.find_one({"_id": ObjectId(client_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid client ID format")
+    client = db.clients.find_one({"_id": obj_id})
     
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    return ClientOut(**serialize_client(client))
+    return ClientOut.model_validate(client)
 
 
 @router.put("/clients/{client_id}", response_model=ClientOut)
-async def update_client(client_id: str, client_update: ClientUpdate, user=Depends(require_superadmin)):
+def update_client(client_update: ClientUpdate, obj_id: ObjectId = Depends(valid_object_id), user=Depends(require_superadmin)):
     """
     Update client information (Super Admin only).
     """
     db = get_db()
     
-    try:
-        obj_id = ObjectId(client_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid client ID format")
-    
     # Check if client exists
     existing = db.clients.find_one({"_id": obj_id})
     if not existing:
@@ -127,11 +117,11 @@ async def update_client(client_id: str, client_update: ClientUpdate, user=Depend
     # Fetch updated document
     updated_client = db.clients.find_one({"_id": obj_id})
     
-    return ClientOut(**serialize_client(updated_client))
+    return ClientOut.model_validate(updated_client)
 
 
 @router.delete("/clients/{client_id}")
-async def delete_client(client_id: str, user=Depends(require_superadmin)):
+def delete_client(obj_id: ObjectId = Depends(valid_object_id), user=Depends(require_superadmin)):
     """
     Delete a client (Super Admin only).
     
@@ -139,11 +129,6 @@ async def delete_client(client_id: str, user=Depends(require_superadmin)):
     """
     db = get_db()
     
-    try:
-        obj_id = ObjectId(client_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid client ID format")
-    
     # Check if client exists
     client = db.clients.find_one({"_id": obj_id})
     if not client:
@@ -153,6 +138,8 @@ async def delete_client(client_id: str, user=Depends(require_superadmin)):
     
     # Delete associated users
     user_result = db.users.delete_many({"client_id": enl_id})
+    # Their tokens must stop working now, not when the cache entries expire
+    clear_token_cache()
     
     # Delete client document
     db.clients.delete_one({"_id": obj_id})
@@ -164,18 +151,13 @@ async def delete_client(client_id: str, user=Depends(require_superadmin)):
 
 
 @router.get("/clients/{client_id}/stats")
-async def get_client_stats(client_id: str, user=Depends(require_superadmin)):
+def get_client_stats(obj_id: ObjectId = Depends(valid_object_id), user=Depends(require_superadmin)):
     """
     Get statistics for a specific client (Super Admin only).
     """
-    logger.debug("get_client_stats called for client_id=%s", client_id)
+    logger.debug("get_client_stats called for client_id=%s", obj_id)
     db = get_db()
     
-    try:
-        obj_id = ObjectId(client_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid client ID format")
-    
     client = db.clients.find_one({"_id": obj_id})
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
@@ -185,11 +167,11 @@ async def get_client_stats(client_id: str, user=Depends(require_superadmin)):
     # Get user count
     user_count = db.users.count_documents({"client_id": enl_id})
     
-    # Get chat history count
-    chat_count = db.chat_history.count_documents({"client_id": enl_id}) if "chat_history" in db.list_collection_names() else 0
+    # Get chat history count (a missing collection simply counts as 0)
+    chat_count = db.chat_history.count_documents({"client_id": enl_id})
     
     return {
-        "client_id": client_id,
+        "client_id": str(obj_id),
         "client_name": client.get("name"),
         "enl_id": enl_id,
         "user_count": user_count,
@@ -1,43 +1,60 @@
 """
 Health check endpoints.
 """
-from fastapi import APIRouter
-from datetime import datetime
-import os
+from fastapi import APIRouter, Request, Response
+import hashlib
+import json
+
+from backend.utils.config import config
+from backend.utils.timestamps import utc_now_iso
 
 router = APIRouter()
 
+# The health payload never changes for the life of the process, so it is
+# serialized once and served as raw bytes with a stable ETag.
+_HEALTH_BODY = json.dumps({
+    "status": "healthy",
+    "service": "chatbot-api",
+    "version": "1.0.0",
+    "environment": config.ENVIRONMENT
+}).encode()
+_HEALTH_HEADERS = {
+    "Cache-Control": "max-age=1",
+    "ETag": '"%s"' % hashlib.sha1(_HEALTH_BODY).hexdigest()
+}
+
+
+def static_json_response(request: Request, body: bytes, headers: dict) -> Response:
+    """Serve a pre-serialized JSON body, answering If-None-Match with 304."""
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 @router.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint."""
-    return {
-        "status": "healthy",
-        "service": "chatbot-api",
-        "version": "1.0.0",
-        "timestamp": datetime.utcnow().isoformat(),
-        "environment": os.getenv("ENVIRONMENT", "development")
-    }
+    return static_json_response(request, _HEALTH_BODY, _HEALTH_HEADERS)
 
 
 @router.get("/status")
 async def status():
     """Detailed status endpoint."""
-    from ...services.chatbot_orchestrator import ChatbotOrchestrator
+    from .chat import get_orchestrator
 
     try:
-        orchestrator = ChatbotOrchestrator()
+        orchestrator = get_orchestrator()
         stats = orchestrator.get_stats()
 
         return {
             "status": "operational",
             "stats": stats,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utc_now_iso()
         }
     except Exception as e:
         return {
             "status": "error",
             "error": str(e),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utc_now_iso()
         }
 
@@ -2,14 +2,31 @@
 Ingestion API endpoints - allows dynamic website ingestion.
 """
 from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File, Form
-from pydantic import BaseModel, Field
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from pathlib import Path
 from datetime import datetime
+import asyncio
+import sys
+import threading
 import uuid
 import logging
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import aiofiles
+except ImportError:
+    aiofiles = None
+
+from backend.api.responses import DefaultResponse
 from backend.data_ingestion.pipeline import IngestionPipeline
+from backend.data_ingestion.scraper import close_shared_http_session, get_shared_http_session
+from backend.services import cache
 from backend.services.db import get_db
 import os
 
@@ -18,9 +35,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 UPLOAD_BASE = os.getenv("UPLOAD_BASE", "./data/uploads")
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "100"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-# In-memory cache for quick lookup
-ingestion_jobs = {}
+# Minimum interval between progress writes to the job document
+PROGRESS_FLUSH_SECONDS = 5.0
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 
 
 class IngestionRequest(BaseModel):
@@ -30,15 +51,14 @@ class IngestionRequest(BaseModel):
     reset: Optional[bool] = Field(False, description="Reset existing collection")
     client_id: Optional[str] = Field(None, description="Client ID for tenant isolation (optional)")
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "url": "https://docs.python.org",
-                "max_pages": 50,
-                "max_depth": 3,
-                "reset": False
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "url": "https://docs.python.org",
+            "max_pages": 50,
+            "max_depth": 3,
+            "reset": False
         }
+    })
 
 
 class IngestionResponse(BaseModel):
@@ -59,47 +79,162 @@ class IngestionStatusResponse(BaseModel):
     error: Optional[str] = None
 
 
-def run_ingestion_task_sync(job_id: str, url: str, max_pages: int, max_depth: int, reset: bool, client_id: str | None = None, files: list[str] | None = None):
-    """Synchronous wrapper that creates a new event loop with Windows policy."""
-    import asyncio
-    import sys
-    
-    if sys.platform == 'win32':
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
+def _iso_z(value) -> str | None:
+    """Format a job timestamp; cached jobs carry ISO strings, Mongo docs datetimes."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value + "Z"
+    return value.isoformat() + "Z"
+
+
+def get_celery_task():
+    """Return the Celery ingestion task when a broker is configured, else None."""
+    if not CELERY_BROKER_URL:
+        return None
     try:
-        loop.run_until_complete(_run_ingestion_async(job_id, url, max_pages, max_depth, reset, client_id, files))
-    finally:
-        loop.close()
+        from backend.workers.celery_app import run_ingestion_task
+    except ImportError:
+        logger.warning("CELERY_BROKER_URL is set but celery is not installed; using in-process background tasks")
+        return None
+    return run_ingestion_task
+
+
+def dispatch_ingestion(background_tasks: BackgroundTasks, job_id: str, *args):
+    """Queue an ingestion job on Celery if available, otherwise as a FastAPI background task.
+
+    Blocks on the broker and the job cache; call it from a worker thread.
+    """
+    task = get_celery_task()
+    if task is not None:
+        task.delay(job_id, *args)
+        # A per-process cache would never see the worker's updates
+        if not cache.is_shared():
+            cache.delete_job(job_id)
+    else:
+        background_tasks.add_task(run_ingestion_task_sync, job_id, *args)
+
+
+# Long-lived loop every in-process job runs on, so the shared HTTP session
+# (and its pooled connections) outlives any single job
+_job_loop: asyncio.AbstractEventLoop | None = None
+_job_thread: threading.Thread | None = None
+_job_loop_lock = threading.Lock()
+
+
+def _new_event_loop() -> asyncio.AbstractEventLoop:
+    """Create an event loop for ingestion jobs (uvloop when available)."""
+    if sys.platform == 'win32':
+        # Build the selector loop directly rather than swapping the global policy
+        return asyncio.SelectorEventLoop()
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def get_job_loop() -> asyncio.AbstractEventLoop:
+    """Return the ingestion job loop, starting its thread on first use."""
+    global _job_loop, _job_thread
+    with _job_loop_lock:
+        if _job_loop is None:
+            _job_loop = _new_event_loop()
+            _job_thread = threading.Thread(target=_job_loop.run_forever, name="ingestion-loop", daemon=True)
+            _job_thread.start()
+        return _job_loop
+
+
+def shutdown_job_loop():
+    """Close the shared HTTP session and stop the ingestion job loop."""
+    global _job_loop, _job_thread
+    with _job_loop_lock:
+        if _job_loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(close_shared_http_session(), _job_loop).result(timeout=10)
+        except Exception as e:
+            logger.warning("Could not close the shared HTTP session: %s", e)
+        _job_loop.call_soon_threadsafe(_job_loop.stop)
+        _job_thread.join(timeout=10)
+        if not _job_loop.is_running():
+            _job_loop.close()
+        _job_loop = None
+        _job_thread = None
+
+
+def run_ingestion_task_sync(job_id: str, url: str, max_pages: int, max_depth: int, reset: bool, client_id: str | None = None, files: list[str] | None = None):
+    """Synchronous wrapper that runs the job on the ingestion loop and waits for it."""
+    future = asyncio.run_coroutine_threadsafe(
+        _run_ingestion_async(job_id, url, max_pages, max_depth, reset, client_id, files),
+        get_job_loop()
+    )
+    future.result()
+
+
+async def _update_job(job_id: str, fields: dict):
+    """Apply a $set to the job document in a worker thread so the job loop never blocks on Mongo."""
+    db = get_db()
+    await asyncio.to_thread(db.ingestion_jobs.update_one, {"job_id": job_id}, {"$set": fields})
+
+
+async def _refresh_cached_job(job_id: str):
+    """Re-read the job document and store it in the cache."""
+    db = get_db()
+    job_doc = await asyncio.to_thread(db.ingestion_jobs.find_one, {"job_id": job_id})
+    if job_doc:
+        await asyncio.to_thread(cache.set_job, job_id, job_doc)
+
+
+async def _flush_progress(job_id: str, progress: dict, stop: asyncio.Event):
+    """Write the latest progress snapshot at most every PROGRESS_FLUSH_SECONDS, until stop is set."""
+    written = None
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), PROGRESS_FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        if not stop.is_set() and progress != written:
+            written = dict(progress)
+            await _update_job(job_id, {"progress": written})
+            await asyncio.to_thread(cache.delete_job, job_id)  # next poll re-reads the new progress
+
+
+async def _stop_flusher(flusher: asyncio.Task | None, stop: asyncio.Event):
+    """Stop the progress flusher and wait out any write it has in flight."""
+    stop.set()
+    if flusher is not None:
+        # A write already running in a worker thread can't be cancelled; waiting
+        # for it keeps stale counters from landing after the final update
+        await asyncio.gather(flusher, return_exceptions=True)
 
 
 async def _run_ingestion_async(job_id: str, url: str, max_pages: int, max_depth: int, reset: bool, client_id: str | None = None, files: list[str] | None = None):
     """Actual async ingestion logic."""
+    # Pipeline callbacks only overwrite this dict; the flusher coalesces them
+    # into one write per interval instead of one per page/batch
+    progress = {"message": "Ingestion running"}
+    stop_flushing = asyncio.Event()
+    flusher = None
     try:
         # Mark running in DB
-        db = get_db()
-        db.ingestion_jobs.update_one({"job_id": job_id}, {"$set": {"status": "running", "started_at": datetime.utcnow()}})
+        await _update_job(job_id, {"status": "running", "started_at": datetime.utcnow()})
+        await asyncio.to_thread(cache.delete_job, job_id)  # next poll re-reads the running state from the DB
+        flusher = asyncio.create_task(_flush_progress(job_id, progress, stop_flushing))
 
-        pipeline = IngestionPipeline(url or "", max_pages=max_pages, max_depth=max_depth, client_id=client_id, job_id=job_id)
-        await pipeline.run(reset=reset, files=files)
+        # The process-wide session reuses connections and DNS answers from earlier jobs
+        pipeline = IngestionPipeline(url or "", max_pages=max_pages, max_depth=max_depth, client_id=client_id, job_id=job_id, http=get_shared_http_session())
+        await pipeline.run(reset=reset, files=files, on_progress=progress.update)
+        await _stop_flusher(flusher, stop_flushing)
 
-        # Mark completed
-        db.ingestion_jobs.update_one({"job_id": job_id}, {"$set": {"status": "completed", "completed_at": datetime.utcnow()}})
-        
-        # Update cache
-        job_doc = db.ingestion_jobs.find_one({"job_id": job_id})
-        if job_doc:
-            ingestion_jobs[job_id] = job_doc
+        # Mark completed, carrying the final counts
+        progress["message"] = "Ingestion completed"
+        await _update_job(job_id, {"status": "completed", "completed_at": datetime.utcnow(), "progress": progress})
+        await _refresh_cached_job(job_id)
 
     except Exception as e:
-        db = get_db()
-        db.ingestion_jobs.update_one({"job_id": job_id}, {"$set": {"status": "failed", "error": str(e), "completed_at": datetime.utcnow()}})
-        job_doc = db.ingestion_jobs.find_one({"job_id": job_id})
-        if job_doc:
-            ingestion_jobs[job_id] = job_doc
+        await _stop_flusher(flusher, stop_flushing)
+        progress["message"] = "Ingestion failed"
+        await _update_job(job_id, {"status": "failed", "error": str(e), "completed_at": datetime.utcnow(), "progress": progress})
+        await _refresh_cached_job(job_id)
         logger.error("Ingestion job %s failed: %s", job_id, e, exc_info=True)
 
 
@@ -137,12 +272,14 @@ async def start_ingestion(request: IngestionRequest, background_tasks: Backgroun
             "progress": {"message": "Ingestion job queued"},
             "type": "crawl",
         }
-        db.ingestion_jobs.insert_one(job_doc)
-        ingestion_jobs[job_id] = job_doc
-
-        # Start background task
-        background_tasks.add_task(
-            run_ingestion_task_sync,
+        # Mongo and Redis round-trips run in the threadpool so they never block the event loop
+        await run_in_threadpool(db.ingestion_jobs.insert_one, job_doc)
+        await run_in_threadpool(cache.set_job, job_id, job_doc)
+
+        # Start background job
+        await run_in_threadpool(
+            dispatch_ingestion,
+            background_tasks,
             job_id,
             url,
             request.max_pages,
@@ -167,42 +304,44 @@ async def start_ingestion(request: IngestionRequest, background_tasks: Backgroun
         )
 
 
-@router.get("/ingest/{job_id}", response_model=IngestionStatusResponse)
-async def get_ingestion_status(job_id: str):
+@router.get("/ingest/{job_id}", response_model=None, responses={200: {"model": IngestionStatusResponse}})
+def get_ingestion_status(job_id: str):
     """
     Get the status of an ingestion job.
     """
-    # Try cache first
-    if job_id in ingestion_jobs:
-        job = ingestion_jobs[job_id]
-    else:
+    # Try the shared cache first; Mongo only on a cold miss
+    job = cache.get_job(job_id)
+    if job is None:
         db = get_db()
         job = db.ingestion_jobs.find_one({"job_id": job_id})
+        if job:
+            cache.set_job(job_id, job)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    started_at = job.get("started_at")
-    completed_at = job.get("completed_at")
-
-    return IngestionStatusResponse(
-        job_id=job_id,
-        status=job.get("status", "unknown"),
-        url=job.get("url", ""),
-        progress=job.get("progress", {}),
-        started_at=started_at.isoformat() + "Z" if started_at else None,
-        completed_at=completed_at.isoformat() + "Z" if completed_at else None,
-        error=job.get("error")
-    )
+    # Polled every second per job: build the payload directly instead of
+    # validating it through IngestionStatusResponse on each poll
+    return DefaultResponse(content={
+        "job_id": job_id,
+        "status": job.get("status", "unknown"),
+        "url": job.get("url", ""),
+        "progress": job.get("progress") or {},
+        "started_at": _iso_z(job.get("started_at")),
+        "completed_at": _iso_z(job.get("completed_at")),
+        "error": job.get("error"),
+    })
 
 
 @router.get("/ingest")
-async def list_ingestion_jobs():
+def list_ingestion_jobs():
     """
     List all ingestion jobs.
     """
     db = get_db()
-    jobs = list(db.ingestion_jobs.find().sort("created_at", -1).limit(50))
+    # Only the listed fields cross the wire; progress and files can be large
+    projection = {"_id": 0, "job_id": 1, "url": 1, "status": 1, "started_at": 1}
+    jobs = list(db.ingestion_jobs.find({}, projection).sort("created_at", -1).limit(50))
     return {
         "jobs": [
             {
@@ -218,7 +357,7 @@ async def list_ingestion_jobs():
 
 
 @router.delete("/ingest/{job_id}", status_code=204)
-async def delete_ingestion_job(job_id: str):
+def delete_ingestion_job(job_id: str):
     """Delete an ingestion job and its indexed content."""
     db = get_db()
     
@@ -227,12 +366,23 @@ async def delete_ingestion_job(job_id: str):
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
         
+    # Chunks a later job re-crawled are shared with it and must survive
+    owned = list(db.chunk_hashes.find({"job_ids": job_id}, {"_id": 1, "job_ids": 1}))
+    shared = [doc["_id"] for doc in owned if len(doc.get("job_ids") or []) > 1]
+    orphaned = [doc["_id"] for doc in owned if len(doc.get("job_ids") or []) <= 1]
+
     # Delete from vector store
     try:
-        from backend.services.vector_store import VectorStore
-        vs = VectorStore()
-        # Delete using job_id metadata
-        vs.delete_documents(where={"job_id": job_id})
+        from backend.services.vector_store import get_vector_store
+        vs = get_vector_store().get_collection(job.get("client_id"))
+        # Vectors only this job referenced, whichever job first stored them
+        if orphaned:
+            vs.delete_documents(where={"chunk_hash": {"$in": orphaned}})
+        # The rest of this job's vectors, minus those another job still references
+        if shared:
+            vs.delete_documents(where={"$and": [{"job_id": job_id}, {"chunk_hash": {"$nin": shared}}]})
+        else:
+            vs.delete_documents(where={"job_id": job_id})
     except Exception as e:
         logger.warning("Error deleting vectors for job %s: %s", job_id, e)
         # Continue with DB deletion even if vectors fail
@@ -246,24 +396,26 @@ async def delete_ingestion_job(job_id: str):
         except Exception as e:
             logger.warning("Error deleting upload dir %s: %s", upload_dir, e)
 
-    # Delete from DB
+    # Delete from DB; hashes no other job owns go too so re-ingesting re-embeds them
     db.ingestion_jobs.delete_one({"job_id": job_id})
+    if shared:
+        db.chunk_hashes.update_many({"_id": {"$in": shared}}, {"$pull": {"job_ids": job_id}})
+    if orphaned:
+        db.chunk_hashes.delete_many({"_id": {"$in": orphaned}})
     
     # Remove from cache
-    if job_id in ingestion_jobs:
-        del ingestion_jobs[job_id]
+    cache.delete_job(job_id)
         
     return None
 
 
 @router.post("/ingest/reset", status_code=200)
-async def reset_database():
+def reset_database():
     """Reset the entire vector database and clear all jobs."""
     try:
         # Reset vector store
-        from backend.services.vector_store import VectorStore
-        vs = VectorStore()
-        vs.reset_collection()
+        from backend.services.vector_store import get_vector_store
+        get_vector_store().reset_collection()
         
         # Invalidate the chat orchestrator singleton so it picks up the new collection
         from backend.api.routes import chat as chat_module
@@ -278,13 +430,37 @@ async def reset_database():
         # Clear DB jobs
         db = get_db()
         db.ingestion_jobs.delete_many({})
-        ingestion_jobs.clear()
+        db.chunk_hashes.delete_many({})
+        cache.clear_jobs()
         
         return {"message": "Database reset successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to reset database: {e}")
 
 
+async def _save_upload(up: UploadFile, dest: Path):
+    """Stream an upload to disk in fixed-size chunks, enforcing MAX_UPLOAD_MB."""
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    written = 0
+
+    if aiofiles is not None:
+        f = await aiofiles.open(dest, "wb")
+        write, close = f.write, f.close
+    else:
+        f = await asyncio.to_thread(open, dest, "wb")
+        write = lambda data: asyncio.to_thread(f.write, data)  # noqa: E731
+        close = lambda: asyncio.to_thread(f.close)  # noqa: E731
+
+    try:
+        while chunk := await up.read(UPLOAD_CHUNK_SIZE):
+            written += len(chunk)
+            if written > limit:
+                raise HTTPException(status_code=413, detail=f"{up.filename} exceeds the {MAX_UPLOAD_MB} MB upload limit")
+            await write(chunk)
+    finally:
+        await close()
+
+
 @router.post("/ingest/upload", response_model=IngestionResponse)
 async def upload_and_ingest(
     background_tasks: BackgroundTasks,
@@ -307,8 +483,12 @@ async def upload_and_ingest(
         for up in files:
             safe_name = up.filename or f"{uuid.uuid4()}{Path(up.filename or '').suffix}"
             dest = upload_dir / safe_name
-            with open(dest, "wb") as f:
-                f.write(await up.read())
+            try:
+                await _save_upload(up, dest)
+            except HTTPException:
+                import shutil
+                shutil.rmtree(upload_dir, ignore_errors=True)
+                raise
             saved_files.append(str(dest))
 
         job_doc = {
@@ -327,11 +507,11 @@ async def upload_and_ingest(
             "files": saved_files,
         }
 
-        db.ingestion_jobs.insert_one(job_doc)
-        ingestion_jobs[job_id] = job_doc
+        await run_in_threadpool(db.ingestion_jobs.insert_one, job_doc)
+        await run_in_threadpool(cache.set_job, job_id, job_doc)
 
-        # Schedule background task
-        background_tasks.add_task(run_ingestion_task_sync, job_id, "", max_pages, max_depth, reset, client_id, saved_files)
+        # Schedule background job
+        await run_in_threadpool(dispatch_ingestion, background_tasks, job_id, "", max_pages, max_depth, reset, client_id, saved_files)
 
         return IngestionResponse(
             job_id=job_id,
@@ -341,5 +521,7 @@ async def upload_and_ingest(
             timestamp=job_doc["created_at"].isoformat() + "Z"
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload and start ingestion: {str(e)}")
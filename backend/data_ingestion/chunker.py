@@ -1,12 +1,29 @@
 """
 Text chunking for optimal embedding and retrieval.
 """
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
+from itertools import accumulate
 import logging
+import os
 import tiktoken
 
 logger = logging.getLogger(__name__)
 
+# Encodings shared by every TextChunker; None records a failed load so it is
+# not retried for each new chunker
+_ENCODINGS: Dict[str, Optional[tiktoken.Encoding]] = {}
+
+
+def get_encoding(encoding_name: str = "cl100k_base") -> Optional[tiktoken.Encoding]:
+    """Return the process-wide tiktoken encoding, or None if it cannot be loaded."""
+    if encoding_name not in _ENCODINGS:
+        try:
+            _ENCODINGS[encoding_name] = tiktoken.get_encoding(encoding_name)
+        except Exception:
+            _ENCODINGS[encoding_name] = None
+            logger.warning("tiktoken encoding not available, using approximate token counting")
+    return _ENCODINGS[encoding_name]
+
 
 class TextChunker:
     def __init__(
@@ -17,12 +34,8 @@ class TextChunker:
     ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        try:
-            self.encoding = tiktoken.get_encoding(encoding_name)
-        except Exception:
-            # Fallback to approximate token counting
-            self.encoding = None
-            logger.warning("tiktoken encoding not available, using approximate token counting")
+        # None falls back to approximate token counting
+        self.encoding = get_encoding(encoding_name)
 
     def chunk_text(self, text: str, metadata: Dict = None) -> List[Dict]:
         """Split text into chunks with metadata."""
@@ -31,26 +44,7 @@ class TextChunker:
 
         if self.encoding:
             tokens = self.encoding.encode(text)
-            chunks = []
-
-            start = 0
-            while start < len(tokens):
-                end = start + self.chunk_size
-                chunk_tokens = tokens[start:end]
-                chunk_text = self.encoding.decode(chunk_tokens)
-
-                # Merge metadata copy to avoid mutation
-                meta = dict(metadata or {})
-                chunk_data = {
-                    'text': chunk_text,
-                    'metadata': meta,
-                    'token_count': len(chunk_tokens)
-                }
-
-                chunks.append(chunk_data)
-
-                # Move start with overlap
-                start = end - self.chunk_overlap
+            chunks = list(self._iter_token_chunks(text, tokens, metadata))
         else:
             # Fallback: approximate chunking by characters
             chunks = []
@@ -75,11 +69,46 @@ class TextChunker:
 
         return chunks
 
+    def _iter_token_chunks(self, text: str, tokens: List[int], metadata: Dict = None) -> Iterator[Dict]:
+        """Window a token list and slice each window out of the original text."""
+        # Byte offset of every token boundary, computed once per text; each
+        # window is then a slice of the UTF-8 source instead of a decode call.
+        # Overlapping windows no longer re-decode the shared tokens.
+        offsets = [0, *accumulate(map(len, self.encoding.decode_tokens_bytes(tokens)))]
+        try:
+            data = text.encode('utf-8')
+        except UnicodeEncodeError:
+            # Surrogates (PyPDF2 can emit them): apply tiktoken's own fixup, which
+            # joins pairs and turns lone ones into U+FFFD, so offsets stay aligned
+            data = text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace').encode('utf-8')
+        step = max(1, self.chunk_size - self.chunk_overlap)
+
+        for start in range(0, len(tokens), step):
+            end = min(start + self.chunk_size, len(tokens))
+            # errors='replace' matches tiktoken's decode for tokens that split a character
+            chunk_text = data[offsets[start]:offsets[end]].decode('utf-8', errors='replace')
+
+            # Merge metadata copy per chunk to avoid mutation
+            yield {
+                'text': chunk_text,
+                'metadata': dict(metadata or {}),
+                'token_count': end - start
+            }
+
     def chunk_pages(self, pages: List[Dict], extra_metadata: Dict = None) -> List[Dict]:
         """Chunk multiple pages."""
-        all_chunks = []
+        return list(self.chunk_pages_iter(pages, extra_metadata))
+
+    def chunk_pages_iter(self, pages: List[Dict], extra_metadata: Dict = None) -> Iterator[Dict]:
+        """Yield chunks of multiple pages one at a time, building each chunk's text on demand."""
+        contents = []
+        metas = []
 
         for page in pages:
+            content = page.get('content', '')
+            if not content or not content.strip():
+                continue
+
             metadata = {
                 'source_url': page.get('url', ''),
                 'title': page.get('title', 'Untitled')
@@ -89,12 +118,17 @@ class TextChunker:
             if extra_metadata:
                 metadata.update({k: v for k, v in extra_metadata.items() if v is not None})
 
-            content = page.get('content', '')
-            if content:
-                chunks = self.chunk_text(content, metadata)
-                all_chunks.extend(chunks)
+            contents.append(content)
+            metas.append(metadata)
 
-        return all_chunks
+        if self.encoding:
+            # Tokenize every page in one call; tiktoken parallelizes across pages
+            token_lists = self.encoding.encode_batch(contents, num_threads=os.cpu_count() or 1)
+            for content, tokens, metadata in zip(contents, token_lists, metas):
+                yield from self._iter_token_chunks(content, tokens, metadata)
+        else:
+            for content, metadata in zip(contents, metas):
+                yield from self.chunk_text(content, metadata)
 
 
 # CLI usage
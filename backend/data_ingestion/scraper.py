@@ -1,39 +1,158 @@
 """
 Web scraper to extract content from target website.
-Supports Playwright for JavaScript-rendered pages and falls back to requests for simpler pages.
+Supports Playwright for JavaScript-rendered pages and falls back to aiohttp for simpler pages.
 """
 import asyncio
+import re
 import sys
 import logging
 from bs4 import BeautifulSoup
 import aiohttp
-from typing import List, Dict, Set
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Set
 import os
 from urllib.parse import urljoin, urlparse
-import requests
 
 logger = logging.getLogger(__name__)
 
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+try:
+    import lxml.html as lxml_html
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_html = None
+
+# lxml's C parser builds the tree noticeably faster than the pure-Python html.parser
+HTML_PARSER = 'lxml' if lxml_html is not None else 'html.parser'
+
+# Non-content elements dropped before extracting page text
+SKIP_TAGS = ('script', 'style', 'nav', 'footer', 'header', 'aside', 'noscript')
+_SKIP_XPATH = '|'.join(f'//{tag}' for tag in SKIP_TAGS)
+
+# Browser tabs rendering pages concurrently on the Playwright path
+PLAYWRIGHT_TABS = 4
+
+# Common non-content URLs, matched as substrings of the lowercased URL
+EXCLUDE_PATTERNS = (
+    '/login', '/register', '/signup', '/signin',
+    '/admin', '/api/', '/auth/',
+    '.pdf', '.jpg', '.png', '.gif', '.svg',
+    '.zip', '.doc', '.docx', '.xls', '.xlsx',
+    '/download', '/uploads',
+    'javascript:', 'mailto:', 'tel:'
+)
+# One alternation scans each URL in a single C-level pass instead of one
+# substring search per pattern
+_EXCLUDE_RE = re.compile('|'.join(re.escape(p) for p in EXCLUDE_PATTERNS))
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Create a pooled HTTP session (keep-alive, DNS cache, per-host limit).
+
+    Must be created and closed on the event loop that uses it.
+    """
+    connector = aiohttp.TCPConnector(limit=200, limit_per_host=32, ttl_dns_cache=300, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT)
+
+
+# Session kept for the life of the process so keep-alive connections and
+# cached DNS answers carry over from one crawl to the next
+_shared_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_shared_http_session() -> aiohttp.ClientSession:
+    """Return the process-wide HTTP session, creating it on first use.
+
+    Every caller must run on the same long-lived event loop.
+    """
+    global _shared_session
+    if _shared_session is None or _shared_session.closed:
+        _shared_session = create_http_session()
+    return _shared_session
+
+
+async def close_shared_http_session():
+    """Close the process-wide HTTP session, if one was opened."""
+    global _shared_session
+    if _shared_session is not None:
+        await _shared_session.close()
+        _shared_session = None
+
 
 class WebScraper:
-    def __init__(self, base_url: str, max_pages: int = 100, max_depth: int = 3):
+    def __init__(self, base_url: str, max_pages: int = 100, max_depth: int = 3, session: Optional[aiohttp.ClientSession] = None):
         self.base_url = base_url.rstrip('/')
+        self.session = session
+        self._on_page = None
+        # Pages scraped this crawl; the max_pages quota is checked against it
+        self._page_count = 0
+        # Caps in-flight fetches across the crawl
+        self._concurrency = int(os.getenv('SCRAPER_CONCURRENCY', '20'))
+        self._fetch_sem = asyncio.Semaphore(self._concurrency)
         self.max_pages = max_pages
         self.max_depth = max_depth
         self.visited_urls: Set[str] = set()
         self.domain = urlparse(base_url).netloc
+        # Same-domain checks compare string prefixes instead of re-parsing every href
+        self._domain_roots = tuple(f"{scheme}://{self.domain}" for scheme in ('http', 'https'))
+        self._domain_prefixes = tuple(root + '/' for root in self._domain_roots)
         self.use_playwright = os.getenv('USE_PLAYWRIGHT', 'false').lower() == 'true'
 
-    async def crawl(self) -> List[Dict]:
-        """Crawl website and extract pages."""
+    async def crawl(self, on_page: Optional[Callable[[Dict], Awaitable[None]]] = None) -> List[Dict]:
+        """Crawl website and extract pages, awaiting on_page for each one as it is scraped.
+
+        With on_page set, pages are only streamed and the returned list is empty.
+        """
+        self._on_page = on_page
         if self.use_playwright:
             return await self._crawl_with_playwright()
         else:
             return await self._crawl_with_requests()
 
+    async def crawl_iter(self) -> AsyncIterator[Dict]:
+        """Yield pages as they are scraped instead of after the whole crawl."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+        done = object()
+
+        async def _run():
+            try:
+                await self.crawl(on_page=queue.put)
+            finally:
+                # Never block here: a consumer that stopped early won't drain the queue
+                try:
+                    queue.put_nowait(done)
+                except asyncio.QueueFull:
+                    pass
+
+        task = asyncio.create_task(_run())
+        try:
+            while (page := await queue.get()) is not done:
+                yield page
+                # The sentinel was dropped on a full queue; the finished task stands in for it
+                if task.done() and queue.empty():
+                    break
+            await task  # surface crawl errors
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def _emit(self, pages: List, page_data: Dict):
+        """Count a scraped page and hand it to the streaming consumer, else collect it."""
+        self._page_count += 1
+        if self._on_page is not None:
+            # Streamed pages aren't kept, so memory stays bounded by the consumer's queue
+            await self._on_page(page_data)
+        else:
+            pages.append(page_data)
+
     async def _crawl_with_playwright(self) -> List[Dict]:
         """Crawl using Playwright for JavaScript-rendered pages."""
         pages = []
+        self._page_count = 0
 
         try:
             # Set Windows event loop policy for subprocess support
@@ -44,10 +163,12 @@ class WebScraper:
             
             async with async_playwright() as p:
                 browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
+                # One isolated context per tab, reused for the whole crawl
+                contexts = [await browser.new_context() for _ in range(PLAYWRIGHT_TABS)]
+                tabs = [await context.new_page() for context in contexts]
 
                 # Start crawling from base URL
-                await self._crawl_page_playwright(page, self.base_url, pages, depth=0)
+                await self._crawl_playwright_breadth_first(tabs, pages)
 
                 await browser.close()
         except Exception as e:
@@ -58,65 +179,123 @@ class WebScraper:
         return pages
 
     async def _crawl_with_requests(self) -> List[Dict]:
-        """Crawl using requests/aiohttp (simpler, works on all platforms)."""
+        """Crawl using aiohttp (simpler, works on all platforms)."""
         pages = []
+        self._page_count = 0
         self.visited_urls.clear()
-        
-        await self._crawl_page_requests(self.base_url, pages, depth=0)
+
+        # Reuse the injected session; otherwise own one for this crawl so
+        # every fetch shares pooled keep-alive connections
+        owns_session = self.session is None
+        if owns_session:
+            self.session = create_http_session()
+        try:
+            await self._crawl_breadth_first(pages)
+        finally:
+            if owns_session:
+                await self.session.close()
+                self.session = None
         
         return pages
 
-    async def _crawl_page_requests(self, url: str, pages: List, depth: int):
-        """Crawl a page using requests (sync but wrapped in async)."""
-        if url in self.visited_urls or len(pages) >= self.max_pages or depth > self.max_depth:
-            return
-
-        self.visited_urls.add(url)
-
+    async def _crawl_breadth_first(self, pages: List):
+        """Crawl level by level with a pool of workers fetching concurrently."""
+        queue: asyncio.Queue = asyncio.Queue()
+        # URLs are marked visited when queued so no page is fetched twice
+        self.visited_urls.add(self.base_url)
+        queue.put_nowait((self.base_url, 0))
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    if self._page_count < self.max_pages:
+                        await self._crawl_page_requests(url, pages, depth, queue)
+                finally:
+                    queue.task_done()
+
+        # The fetch semaphore sets the pace; no fixed per-page sleep
+        workers = [asyncio.create_task(worker()) for _ in range(self._concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _fetch(self, url: str) -> str:
+        """Fetch a page body over the shared session."""
+        async with self._fetch_sem:
+            async with self.session.get(url, allow_redirects=True) as response:
+                response.raise_for_status()
+                return await response.text(errors='replace')
+
+    async def _crawl_page_requests(self, url: str, pages: List, depth: int, queue: asyncio.Queue):
+        """Fetch and extract one page over HTTP, queueing its unvisited links."""
         try:
             logger.info("Crawling: %s (depth: %d)", url, depth)
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-            response.raise_for_status()
-            
-            content = response.text
-            soup = BeautifulSoup(content, 'html.parser')
+            content = await self._fetch(url)
+            page_data = self._parse_page(content, url)
 
-            page_data = {
-                'url': url,
-                'title': self._extract_title(soup, url),
-                'content': self._extract_text(soup),
-                'links': self._extract_links(soup, url)
-            }
+            # Other workers may have filled the quota while this page was in flight
+            if self._page_count >= self.max_pages:
+                return
 
-            pages.append(page_data)
+            await self._emit(pages, page_data)
             title_preview = (page_data['title'] or 'No title')[:50]
             logger.info("[OK] Extracted: %s...", title_preview)
 
-            # Crawl linked pages
-            for link in page_data['links'][:10]:
-                if self._should_crawl(link):
-                    await self._crawl_page_requests(link, pages, depth + 1)
-                    # Small delay to be polite
-                    await asyncio.sleep(0.5)
+            # Queue linked pages
+            if depth < self.max_depth:
+                for link in page_data['links'][:10]:
+                    if link not in self.visited_urls and self._should_crawl(link):
+                        self.visited_urls.add(link)
+                        queue.put_nowait((link, depth + 1))
 
         except Exception as e:
             logger.warning("Error crawling %s: %s", url, e)
 
-    async def _crawl_page_playwright(self, page, url: str, pages: List, depth: int):
-        """Recursively crawl pages using Playwright."""
-        if url in self.visited_urls or len(pages) >= self.max_pages or depth > self.max_depth:
-            return
-
-        self.visited_urls.add(url)
-
+    async def _crawl_playwright_breadth_first(self, tabs: List, pages: List):
+        """Crawl breadth-first with one worker per browser tab rendering queued URLs."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self.visited_urls.clear()
+        self.visited_urls.add(self.base_url)
+        queue.put_nowait((self.base_url, 0))
+
+        async def worker(tab):
+            while True:
+                url, depth = await queue.get()
+                try:
+                    if self._page_count >= self.max_pages:
+                        continue
+                    links = await self._crawl_page_playwright(tab, url, pages, depth)
+                    if depth < self.max_depth:
+                        for link in links:
+                            # Mark on enqueue so no URL is rendered twice
+                            if link not in self.visited_urls and self._should_crawl(link):
+                                self.visited_urls.add(link)
+                                queue.put_nowait((link, depth + 1))
+                finally:
+                    queue.task_done()
+
+        # A tab picks up the next URL as soon as it is free rather than
+        # waiting for the rest of a batch
+        workers = [asyncio.create_task(worker(tab)) for tab in tabs]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _crawl_page_playwright(self, page, url: str, pages: List, depth: int) -> List[str]:
+        """Render and extract one page with Playwright; return the links to follow."""
         try:
             logger.info("Crawling: %s (depth: %d)", url, depth)
-            await page.goto(url, wait_until='networkidle', timeout=30000)
+            # networkidle can stall for the full timeout on pages with
+            # long-polling or analytics; the fixed wait below covers rendering
+            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
 
             # Wait a bit for dynamic content
             await asyncio.sleep(1)
@@ -124,38 +303,89 @@ class WebScraper:
             content = await page.content()
 
             # Extract content
-            soup = BeautifulSoup(content, 'html.parser')
+            page_data = self._parse_page(content, url)
 
-            page_data = {
-                'url': url,
-                'title': self._extract_title(soup, url),
-                'content': self._extract_text(soup),
-                'links': self._extract_links(soup, url)
-            }
+            if self._page_count >= self.max_pages:
+                return []
 
-            pages.append(page_data)
+            await self._emit(pages, page_data)
             logger.info("[OK] Extracted: %s...", page_data['title'][:50])
 
-            # Crawl linked pages (limited per page)
-            for link in page_data['links'][:10]:
-                if self._should_crawl(link):
-                    await self._crawl_page_playwright(page, link, pages, depth + 1)
+            # Follow linked pages (limited per page)
+            return page_data['links'][:10]
 
         except Exception as e:
             logger.warning("Error crawling %s: %s", url, e)
+            return []
+
+    def _parse_page(self, content: str, url: str) -> Dict:
+        """Extract the title, text and links of an HTML document."""
+        if lxml_html is not None:
+            try:
+                return self._parse_page_lxml(content, url)
+            except (ValueError, lxml_etree.ParserError):
+                pass  # empty documents, XML encoding declarations: let BeautifulSoup cope
+
+        soup = BeautifulSoup(content, HTML_PARSER)
+        return {
+            'url': url,
+            'title': self._extract_title(soup, url),
+            'content': self._extract_text(soup),
+            'links': self._extract_links(soup, url)
+        }
+
+    def _parse_page_lxml(self, content: str, url: str) -> Dict:
+        """Same extraction as the BeautifulSoup path, run directly on lxml's C tree."""
+        tree = lxml_html.document_fromstring(content)
+
+        # First h1 and first title in one walk that stops once both are found
+        h1 = title_el = None
+        for element in tree.iter('h1', 'title'):
+            if element.tag == 'h1':
+                h1 = h1 if h1 is not None else element
+            elif title_el is None:
+                title_el = element
+            if h1 is not None and title_el is not None:
+                break
+        title = self._choose_title(
+            ''.join(s.strip() for s in h1.itertext()) if h1 is not None else '',
+            title_el.text if title_el is not None and len(title_el) == 0 else None,
+            url
+        )
+
+        # Emptying (rather than dropping) keeps the text after each element as
+        # its own string, as decompose() does
+        for element in tree.xpath(_SKIP_XPATH):
+            element.clear(keep_tail=True)
+
+        hrefs = [href for href in (a.get('href') for a in tree.iter('a')) if href is not None]
+        return {
+            'url': url,
+            'title': title,
+            'content': self._clean_text('\n'.join(tree.itertext())),
+            'links': self._normalize_links(hrefs, url)
+        }
 
     def _extract_title(self, soup: BeautifulSoup, url: str) -> str:
         """Extract a descriptive title for the page."""
-        # Try to get h1 first (usually more descriptive)
         h1 = soup.find('h1')
-        if h1 and h1.get_text(strip=True):
-            title = h1.get_text(strip=True)[:100]
+        return self._choose_title(
+            h1.get_text(strip=True) if h1 else '',
+            soup.title.string if soup.title else None,
+            url
+        )
+
+    def _choose_title(self, h1_text: str, title_text: Optional[str], url: str) -> str:
+        """Pick the page title from the first h1, the title tag, or the URL path."""
+        # Try to get h1 first (usually more descriptive)
+        if h1_text:
+            title = h1_text[:100]
             if len(title) > 10:  # Reasonable length for a title
                 return title
-        
+
         # Fall back to title tag
-        if soup.title and soup.title.string:
-            title = soup.title.string.strip()
+        if title_text:
+            title = title_text.strip()
             # Remove common suffixes like "| SLTMobitel" or " - Company Name"
             for separator in [' | ', ' - ', ' – ', ' — ']:
                 if separator in title:
@@ -166,7 +396,7 @@ class WebScraper:
                         break
             if title:
                 return title[:100]
-        
+
         # Extract from URL path as last resort
         parsed = urlparse(url)
         path = parsed.path.strip('/').replace('-', ' ').replace('_', ' ')
@@ -174,57 +404,50 @@ class WebScraper:
             # Capitalize words
             title = ' '.join(word.capitalize() for word in path.split('/')[-1].split())
             return title[:100] if title else 'Web Page'
-        
+
         return 'Web Page'
 
     def _extract_text(self, soup: BeautifulSoup) -> str:
         """Extract main text content."""
         # Remove script, style, nav, and footer elements
-        for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'noscript']):
+        for element in soup(list(SKIP_TAGS)):
             element.decompose()
 
-        # Get text
-        text = soup.get_text(separator='\n')
+        return self._clean_text(soup.get_text(separator='\n'))
 
-        # Clean up whitespace
+    @staticmethod
+    def _clean_text(text: str) -> str:
+        """Strip every line and drop the blank ones."""
         lines = [line.strip() for line in text.splitlines()]
-        text = '\n'.join(line for line in lines if line)
-
-        return text
+        return '\n'.join(line for line in lines if line)
 
     def _extract_links(self, soup: BeautifulSoup, current_url: str) -> List[str]:
         """Extract and normalize links."""
-        links = []
+        return self._normalize_links((a['href'] for a in soup.find_all('a', href=True)), current_url)
 
-        for a in soup.find_all('a', href=True):
-            href = a['href']
+    def _normalize_links(self, hrefs, current_url: str) -> List[str]:
+        """Resolve hrefs against the page and keep unique same-domain URLs in document order."""
+        links = []
+        seen = set()
 
+        for href in hrefs:
             # Convert relative to absolute URLs
             absolute_url = urljoin(current_url, href)
 
+            # Remove fragments and query parameters for consistency
+            clean_url = absolute_url.partition('#')[0].partition('?')[0]
+
             # Only include links from same domain
-            if urlparse(absolute_url).netloc == self.domain:
-                # Remove fragments and query parameters for consistency
-                clean_url = absolute_url.split('#')[0].split('?')[0]
-                if clean_url not in links:
+            if clean_url.startswith(self._domain_prefixes) or clean_url in self._domain_roots:
+                if clean_url not in seen:
+                    seen.add(clean_url)
                     links.append(clean_url)
 
         return links
 
     def _should_crawl(self, url: str) -> bool:
         """Determine if URL should be crawled."""
-        # Exclude common non-content URLs
-        exclude_patterns = [
-            '/login', '/register', '/signup', '/signin',
-            '/admin', '/api/', '/auth/',
-            '.pdf', '.jpg', '.png', '.gif', '.svg',
-            '.zip', '.doc', '.docx', '.xls', '.xlsx',
-            '/download', '/uploads',
-            'javascript:', 'mailto:', 'tel:'
-        ]
-
-        url_lower = url.lower()
-        return not any(pattern in url_lower for pattern in exclude_patterns)
+        return _EXCLUDE_RE.search(url.lower()) is None
 
 
 # CLI usage
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
 from typing import Optional
 from datetime import datetime
 
@@ -25,11 +25,28 @@ class ClientUpdate(BaseModel):
 
 
 class ClientOut(BaseModel):
-    id: str = Field(..., description="MongoDB ObjectId as string")
+    """Client response model; validates raw MongoDB documents directly."""
+
+    model_config = ConfigDict(populate_by_name=True, from_attributes=True)
+
+    id: str = Field(..., validation_alias=AliasChoices("id", "_id"), description="MongoDB ObjectId as string")
     name: str = Field(..., description="Client company name")
     enl_id: str = Field(..., description="Unique enterprise license ID")
-    rag_config: RAGConfig = Field(..., description="Client-specific RAG configuration")
+    rag_config: RAGConfig = Field(default_factory=RAGConfig, description="Client-specific RAG configuration")
     status: str = Field(..., description="Client status")
     created_at: datetime = Field(..., description="Creation timestamp")
     updated_at: Optional[datetime] = Field(None, description="Last update timestamp")
     document_count: Optional[int] = Field(0, description="Number of ingested documents")
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _stringify_object_id(cls, value):
+        return str(value)
+
+    @field_validator("rag_config", mode="before")
+    @classmethod
+    def _default_rag_config(cls, value):
+        return value or DEFAULT_RAG_CONFIG
+
+
+DEFAULT_RAG_CONFIG = RAGConfig().model_dump()
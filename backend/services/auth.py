@@ -2,10 +2,14 @@
 Authentication utilities: password hashing, JWT handling, FastAPI dependencies.
 """
 import os
+import time
+import hashlib
+import threading
 from datetime import datetime, timedelta
 from typing import Optional
 
 import bcrypt
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
@@ -18,17 +22,34 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "change-this-secret")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRES_MINUTES", "60"))
+# The in-memory dev setup accepts "plain:" password hashes
+USE_FAKE_DB = os.getenv("USE_FAKE_DB", "0") == "1"
+# bcrypt cost factor for new hashes; each +1 doubles hashing time. The
+# in-memory dev setup defaults to the minimum so logins stay instant.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "4" if USE_FAKE_DB else "12"))
+
+# Verified tokens -> (user document, token exp), so repeated requests with
+# the same token skip the JWT decode and the users lookup for a short while
+TOKEN_CACHE_TTL_SECONDS = 30
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
 
 
 logger = logging.getLogger(__name__)
 
+# Only the fields each lookup needs; the password hash never leaves authenticate_user
+_LOGIN_PROJECTION = {"username": 1, "password_hash": 1, "hashed_password": 1, "role": 1, "client_id": 1}
+_USER_PROJECTION = {"username": 1, "role": 1, "client_id": 1}
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password."""
     # Development helper: allow plain text passwords for testing
-    if os.getenv("USE_FAKE_DB", "0") == "1" and isinstance(hashed_password, str) and hashed_password.startswith("plain:"):
+    if USE_FAKE_DB and isinstance(hashed_password, str) and hashed_password.startswith("plain:"):
         return plain_password == hashed_password.split("plain:", 1)[1]
-    
+    if not hashed_password:
+        return False
+
     try:
         return bcrypt.checkpw(
             plain_password.encode('utf-8'),
@@ -40,7 +61,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt."""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -60,7 +81,7 @@ def create_access_token(subject: str, data: Optional[dict] = None, expires_delta
 
 def authenticate_user(username: str, password: str):
     db = get_db()
-    user = db.users.find_one({"username": username})
+    user = db.users.find_one({"username": username}, _LOGIN_PROJECTION)
     if not user:
         logger.debug("Authentication failed: user '%s' not found", username)
         return None
@@ -73,13 +94,20 @@ def authenticate_user(username: str, password: str):
     return user
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def get_current_user(token: str = Depends(oauth2_scheme)):
     """Get current authenticated user."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    key = _token_key(token)
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    # A cached entry never outlives the token itself
+    if cached is not None and (cached[1] is None or cached[1] > time.time()):
+        return dict(cached[0])
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         logger.debug("JWT payload decoded for subject: %s", payload.get("sub"))
@@ -89,11 +117,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     db = get_db()
-    user = db.users.find_one({"username": username})
+    user = db.users.find_one({"username": username}, _USER_PROJECTION)
     if user is None:
         raise credentials_exception
     user["id"] = str(user.get("_id"))
-    return user
+    with _token_cache_lock:
+        _token_cache[key] = (user, payload.get("exp"))
+    return dict(user)
+
+
+def _token_key(token: str) -> str:
+    """Cache key for a bearer token (its hash, so raw tokens are not kept)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+
+
+def clear_token_cache():
+    """Drop every cached token, e.g. after users are deleted."""
+    with _token_cache_lock:
+        _token_cache.clear()
 
 
 def require_admin(user=Depends(get_current_user)):
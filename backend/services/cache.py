@@ -0,0 +1,144 @@
+"""
+Shared cache for ingestion job documents.
+
+Backed by Redis when REDIS_URL is set, so every Uvicorn worker sees the same
+job state; otherwise falls back to a per-process dictionary.
+
+Calls block on the Redis round-trip, so async code runs them in a worker
+thread (run_in_threadpool / asyncio.to_thread).
+"""
+import os
+import logging
+import threading
+
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    def _dumps(value) -> bytes:
+        return orjson.dumps(value, default=str)
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(value) -> bytes:
+        return json.dumps(value, default=str).encode()
+
+    _loads = json.loads
+
+JOB_KEY_PREFIX = "job:"
+JOB_TTL_SECONDS = 86400
+LOCAL_JOB_CACHE_SIZE = 1000
+
+_redis = None
+_redis_unavailable = False
+_redis_lock = threading.Lock()
+
+# Per-process fallback when Redis is not configured; bounded so cold jobs
+# fall back to Mongo instead of accumulating for the life of the worker
+_local_jobs = LRUCache(maxsize=LOCAL_JOB_CACHE_SIZE)
+_local_lock = threading.Lock()
+
+
+def get_redis():
+    """Return the shared Redis client, or None if Redis is not configured/available."""
+    global _redis, _redis_unavailable
+
+    if _redis is None and not _redis_unavailable:
+        with _redis_lock:
+            if _redis is None and not _redis_unavailable:
+                redis_url = os.getenv("REDIS_URL")
+                if not redis_url:
+                    _redis_unavailable = True
+                    return None
+                try:
+                    import redis
+                    pool = redis.ConnectionPool.from_url(redis_url, max_connections=20)
+                    client = redis.Redis(connection_pool=pool)
+                    client.ping()
+                    _redis = client
+                    logger.info("Connected to Redis")
+                except Exception as e:
+                    logger.warning("Could not connect to Redis: %s. Using in-process cache.", e)
+                    _redis_unavailable = True
+                    return None
+
+    return _redis
+
+
+def close_redis():
+    """Release the shared Redis connection pool."""
+    global _redis
+    with _redis_lock:
+        if _redis is not None:
+            _redis.close()
+            _redis = None
+
+
+def is_shared() -> bool:
+    """True when the cache is visible to every process (Redis-backed)."""
+    return get_redis() is not None
+
+
+def get_job(job_id: str):
+    """Return the cached job document, or None on a miss."""
+    client = get_redis()
+    if client is None:
+        with _local_lock:
+            return _local_jobs.get(job_id)
+
+    try:
+        raw = client.get(JOB_KEY_PREFIX + job_id)
+    except Exception as e:
+        logger.warning("Redis get failed for job %s: %s", job_id, e)
+        return None
+    return _loads(raw) if raw else None
+
+
+def set_job(job_id: str, doc: dict, ttl: int = JOB_TTL_SECONDS):
+    """Cache a job document (the Mongo _id is dropped)."""
+    doc = {k: v for k, v in doc.items() if k != "_id"}
+    client = get_redis()
+    if client is None:
+        with _local_lock:
+            _local_jobs[job_id] = doc
+        return
+
+    try:
+        client.set(JOB_KEY_PREFIX + job_id, _dumps(doc), ex=ttl)
+    except Exception as e:
+        logger.warning("Redis set failed for job %s: %s", job_id, e)
+
+
+def delete_job(job_id: str):
+    """Drop a job from the cache."""
+    client = get_redis()
+    if client is None:
+        with _local_lock:
+            _local_jobs.pop(job_id, None)
+        return
+
+    try:
+        client.delete(JOB_KEY_PREFIX + job_id)
+    except Exception as e:
+        logger.warning("Redis delete failed for job %s: %s", job_id, e)
+
+
+def clear_jobs():
+    """Drop every cached job."""
+    client = get_redis()
+    if client is None:
+        with _local_lock:
+            _local_jobs.clear()
+        return
+
+    try:
+        keys = list(client.scan_iter(match=JOB_KEY_PREFIX + "*", count=500))
+        if keys:
+            client.delete(*keys)
+    except Exception as e:
+        logger.warning("Redis clear failed: %s", e)
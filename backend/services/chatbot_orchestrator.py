@@ -1,23 +1,83 @@
 """
 Main chatbot orchestration logic (RAG pipeline).
 """
+import asyncio
+import inspect
 import logging
+from cachetools import LRUCache
 from .embeddings import EmbeddingService
-from .vector_store import VectorStore
+from .vector_store import CLIENT_STORE_CACHE_SIZE, get_vector_store
 from .llm_service import LLMService
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Tuple, Union
 import os
 
 logger = logging.getLogger(__name__)
 
+TOP_K = int(os.getenv("TOP_K", "5"))
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "1.2"))
+
+# Most queries embedded (or searched) together in one call
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "32"))
+# Recent query embeddings kept per orchestrator; repeated questions skip the model
+QUERY_CACHE_SIZE = 2048
+
+
+class QueryBatcher:
+    """Coalesce concurrent per-query calls (embedding, search) into shared batch calls.
+
+    The first query starts a batch right away; queries arriving while it runs
+    wait and go out together in the next one, so an idle server adds no delay.
+    """
+
+    def __init__(self, run_many, max_batch: int = QUERY_BATCH_SIZE):
+        self._run_many = run_many
+        self._max_batch = max_batch
+        self._pending = []
+        self._drain_task = None
+
+    async def submit(self, item):
+        """Return the result for one item once its batch has run."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        try:
+            while self._pending:
+                batch = self._pending[:self._max_batch]
+                del self._pending[:self._max_batch]
+                try:
+                    results = await asyncio.to_thread(self._run_many, [item for item, _ in batch])
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (_, future), result in zip(batch, results):
+                    if future.done():
+                        continue  # caller went away
+                    if result is None:
+                        future.set_exception(RuntimeError("Batch call returned no result"))
+                    else:
+                        future.set_result(result)
+        finally:
+            self._drain_task = None
+
 
 class ChatbotOrchestrator:
     def __init__(self):
         self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
+        self._query_batcher = QueryBatcher(self.embedding_service.generate_query_embeddings)
+        # One search batcher per client, since each searches its own collection/filter
+        self._search_batchers = LRUCache(maxsize=CLIENT_STORE_CACHE_SIZE)
+        # Only touched from the event loop, so no lock is needed
+        self._query_embeddings = LRUCache(maxsize=QUERY_CACHE_SIZE)
+        self.vector_store = get_vector_store()
         self.llm_service = LLMService()
-        self.top_k = int(os.getenv("TOP_K", "5"))
-        self.similarity_threshold = float(os.getenv("SIMILARITY_THRESHOLD", "1.2"))
+        self.top_k = TOP_K
+        self.similarity_threshold = SIMILARITY_THRESHOLD
 
     async def process_query(
         self,
@@ -25,7 +85,7 @@ class ChatbotOrchestrator:
         session_id: Optional[str] = None,
         conversation_history: Optional[List[Dict]] = None,
         client_id: Optional[str] = None,
-        system_prompt: Optional[str] = None
+        system_prompt: Union[Optional[str], Awaitable[Optional[str]]] = None
     ) -> Dict:
         """Process user query and generate response using RAG pipeline.
         
@@ -34,49 +94,27 @@ class ChatbotOrchestrator:
             session_id: Optional session ID for conversation tracking
             conversation_history: Optional list of previous messages
             client_id: Optional client ID for tenant isolation (None = search all)
-            system_prompt: Optional system prompt to override default behavior
+            system_prompt: Optional system prompt to override default behavior, or an
+                awaitable for it (resolved while retrieval runs)
         """
         logger.info("Processing query: %s...", query[:50])
         if client_id:
             logger.info("  Filtering by client_id: %s", client_id)
 
-        # Step 1: Generate query embedding
-        try:
-            query_embedding = self.embedding_service.generate_embedding(query)
-        except Exception as e:
-            logger.error("Error generating embedding: %s", e)
+        turn = await self._prepare_turn(query, client_id, system_prompt)
+        if turn is None:
             return {
                 "response": "I'm having trouble processing your question. Please try again.",
                 "sources": [],
                 "session_id": session_id,
                 "context_used": False
             }
-
-        # Step 2: Search vector store for relevant documents
-        # Only apply where filter if client_id is provided
-        where_clause = {"client_id": client_id} if client_id else None
-        
-        try:
-            search_results = self.vector_store.search(
-                query_embedding=query_embedding,
-                top_k=self.top_k,
-                where=where_clause
-            )
-        except Exception as e:
-            logger.error("Error searching vector store: %s", e)
-            search_results = {'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
-
-        # Step 3: Prepare context from retrieved documents
-        context = self._prepare_context(search_results)
-        sources = self._extract_sources(search_results)
-
-        # Check if we have relevant context
-        if not context or context.strip() == "":
-            context = "No relevant information found in the knowledge base."
+        context, sources, system_prompt = turn
 
         # Step 4: Generate response using LLM
         try:
-            response = self.llm_service.generate_response(
+            response = await asyncio.to_thread(
+                self.llm_service.generate_response,
                 query=query,
                 context=context,
                 conversation_history=conversation_history,
@@ -94,62 +132,147 @@ class ChatbotOrchestrator:
             "context_used": bool(sources)
         }
 
-    def _prepare_context(self, search_results: Dict) -> str:
-        """Format retrieved documents as context."""
-        if not search_results or not search_results.get('documents'):
-            return ""
-
-        documents = search_results['documents'][0] if search_results['documents'] else []
-        distances = search_results.get('distances', [[]])[0] if search_results.get('distances') else []
-
-        context_parts = []
+    async def process_query_stream(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        client_id: Optional[str] = None,
+        system_prompt: Union[Optional[str], Awaitable[Optional[str]]] = None
+    ) -> AsyncIterator[Dict]:
+        """Like process_query, but yield a sources event first, then answer tokens as the LLM emits them."""
+        logger.info("Processing streamed query: %s...", query[:50])
+        if client_id:
+            logger.info("  Filtering by client_id: %s", client_id)
 
-        for i, doc in enumerate(documents):
-            # Skip if document is empty
-            if not doc or not doc.strip():
-                continue
+        turn = await self._prepare_turn(query, client_id, system_prompt)
+        if turn is None:
+            yield {"type": "sources", "sources": [], "session_id": session_id, "context_used": False}
+            yield {"type": "token", "text": "I'm having trouble processing your question. Please try again."}
+            return
+        context, sources, system_prompt = turn
+
+        yield {"type": "sources", "sources": sources, "session_id": session_id, "context_used": bool(sources)}
+
+        # The SDK streams are blocking iterators; pull each chunk in a worker thread
+        chunks = self.llm_service.generate_response_stream(
+            query=query,
+            context=context,
+            conversation_history=conversation_history,
+            system_prompt=system_prompt
+        )
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                yield {"type": "token", "text": chunk}
+        finally:
+            try:
+                chunks.close()
+            except ValueError:
+                pass  # still running in its thread after a disconnect; it ends on its own
+
+    async def _prepare_turn(
+        self,
+        query: str,
+        client_id: Optional[str],
+        system_prompt: Union[Optional[str], Awaitable[Optional[str]]]
+    ) -> Optional[Tuple[str, List[Dict], Optional[str]]]:
+        """Retrieve and format context (steps 1-3); None if the query cannot be embedded."""
+        # Retrieval runs alongside a pending system prompt lookup
+        if inspect.isawaitable(system_prompt):
+            search_results, system_prompt = await asyncio.gather(self._retrieve(query, client_id), system_prompt)
+        else:
+            search_results = await self._retrieve(query, client_id)
+        if search_results is None:
+            return None
 
-            # Check distance threshold if available (lower distance = higher similarity)
-            if distances and i < len(distances):
-                # ChromaDB uses L2 distance - typically want distance < 2.0 for good matches
-                if distances[i] > self.similarity_threshold:
-                    continue
+        # Step 3: Prepare context from retrieved documents
+        context, sources = self._prepare_context_and_sources(search_results)
 
-            context_parts.append(f"[Source {i+1}]\n{doc}\n")
+        # Check if we have relevant context
+        if not context or context.strip() == "":
+            context = "No relevant information found in the knowledge base."
 
-        if not context_parts:
-            return ""
+        return context, sources, system_prompt
 
-        return "\n".join(context_parts[:self.top_k])
+    async def _retrieve(self, query: str, client_id: Optional[str] = None) -> Optional[Dict]:
+        """Embed the query and search the vector store; None if the query cannot be embedded."""
+        # Step 1: Generate query embedding (cached, else batched with concurrent queries)
+        try:
+            key = query.strip() if query else ""
+            if not key:
+                raise ValueError("Text cannot be empty")
+            query_embedding = self._query_embeddings.get(key)
+            if query_embedding is None:
+                query_embedding = await self._query_batcher.submit(key)
+                self._query_embeddings[key] = query_embedding
+        except Exception as e:
+            logger.error("Error generating embedding: %s", e)
+            return None
 
-    def _extract_sources(self, search_results: Dict) -> List[Dict]:
-        """Extract source information from search results."""
-        if not search_results or not search_results.get('metadatas'):
-            return []
+        # Step 2: Search vector store for relevant documents
+        try:
+            # Search and generation block on I/O; they run off the event loop,
+            # and concurrent queries share embedding and search batches
+            return await self._search_batcher(client_id).submit(query_embedding)
+        except Exception as e:
+            logger.error("Error searching vector store: %s", e)
+            return {'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+
+    def _search_batcher(self, client_id: Optional[str]) -> QueryBatcher:
+        """Batcher for searches scoped to one client (or to none)."""
+        batcher = self._search_batchers.get(client_id)
+        if batcher is None:
+            batcher = QueryBatcher(lambda embeddings: self._search_many(embeddings, client_id))
+            self._search_batchers[client_id] = batcher
+        return batcher
+
+    def _search_many(self, query_embeddings: List, client_id: Optional[str]) -> List[Dict]:
+        """Search the client's own collection, or filter the shared one by client_id, for several queries."""
+        store = self.vector_store.get_collection(client_id)
+        # Only apply where filter if client_id is provided and shares the collection
+        where_clause = {"client_id": client_id} if client_id and store.client_id is None else None
+        results = store.search_batch(query_embeddings, top_k=self.top_k, where=where_clause)
+        # Split the batch back into one single-query result per caller
+        keys = [key for key in ('ids', 'documents', 'metadatas', 'distances') if results.get(key) is not None]
+        return [{key: results[key][i:i + 1] for key in keys} for i in range(len(query_embeddings))]
+
+    def _prepare_context_and_sources(self, search_results: Dict) -> Tuple[str, List[Dict]]:
+        """Format retrieved documents as context and collect their unique sources in one pass."""
+        if not search_results:
+            return "", []
+
+        documents = (search_results.get('documents') or [[]])[0] or []
+        metadatas = (search_results.get('metadatas') or [[]])[0] or []
+        distances = (search_results.get('distances') or [[]])[0] or []
+        threshold = self.similarity_threshold
 
-        metadatas = search_results['metadatas'][0] if search_results['metadatas'] else []
-        distances = search_results.get('distances', [[]])[0] if search_results.get('distances') else []
+        context_parts = []
         sources = []
-
         seen_urls = set()
-        for i, metadata in enumerate(metadatas):
-            if not metadata:
+
+        for i in range(max(len(documents), len(metadatas))):
+            # ChromaDB uses L2 distance (lower = more similar); skip weak matches
+            if i < len(distances) and distances[i] > threshold:
                 continue
 
-            # Skip low-relevance results
-            if distances and i < len(distances):
-                if distances[i] > self.similarity_threshold:
-                    continue
+            # Skip empty documents (isspace avoids building a stripped copy)
+            doc = documents[i] if i < len(documents) else None
+            if doc and not doc.isspace() and len(context_parts) < self.top_k:
+                context_parts.append(f"[Source {i+1}]\n{doc}\n")
 
-            url = metadata.get('source_url', '')
+            metadata = metadatas[i] if i < len(metadatas) else None
+            url = metadata.get('source_url', '') if metadata else ''
             if url and url not in seen_urls:
+                seen_urls.add(url)
                 sources.append({
                     'url': url,
                     'title': metadata.get('title', 'Untitled')
                 })
-                seen_urls.add(url)
 
-        return sources
+        return "\n".join(context_parts), sources
 
     def get_stats(self) -> Dict:
         """Get statistics about the chatbot's knowledge base."""
@@ -7,13 +7,75 @@ Set USE_FAKE_DB=0 or remove it to use real MongoDB.
 from dotenv import load_dotenv
 import os
 import logging
+import threading
+import time
+import importlib.util
 
 load_dotenv()
 
+try:
+    from pymongo.errors import BulkWriteError
+except ImportError:
+    class BulkWriteError(Exception):
+        """Stand-in for pymongo's BulkWriteError when pymongo is not installed."""
+
+        def __init__(self, results):
+            super().__init__('batch op errors occurred')
+            self.details = results
+
 _client = None
+# Set when DATABASE_URL is missing: that choice of the fake DB is permanent
+_client_unconfigured = False
+# Last connection failure, re-raised until the retry backoff has passed
+_client_error = None
+_client_failed_at = 0.0
+_client_lock = threading.Lock()
 _fake_db = None
+# Resolved MongoDB database handle (never the fake), so get_db() is a single global read once warm
+_db = None
+_db_lock = threading.Lock()
 logger = logging.getLogger(__name__)
 
+USE_FAKE_DB = os.getenv('USE_FAKE_DB', '0') == '1'
+MONGODB_DATABASE = os.getenv('MONGODB_DATABASE', 'web_crawler')
+
+# Connection pool bounds for the shared MongoClient (per worker process)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '10'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '1'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 2500
+# Idle pooled sockets are closed after this long instead of lingering
+MONGO_MAX_IDLE_TIME_MS = 60000
+# Seconds to wait after a failed connect before trying MongoDB again
+MONGO_RETRY_BACKOFF_SECONDS = float(os.getenv('MONGO_RETRY_BACKOFF_SECONDS', '5'))
+
+
+def _mongo_compressors() -> str:
+    """Wire compressors to offer the server, best first; zstd/snappy only when their packages are installed."""
+    compressors = [
+        name for name, module in (('zstd', 'zstandard'), ('snappy', 'snappy'))
+        if importlib.util.find_spec(module) is not None
+    ]
+    return ','.join(compressors + ['zlib'])
+
+
+def _hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _index_keys(value):
+    """Index keys for a field value: each element of an array, like a Mongo multikey index."""
+    values = value if isinstance(value, list) else (value,)
+    return [v for v in values if _hashable(v)]
+
+
+def _field_equals(value, expected) -> bool:
+    """Mongo equality: an array field also matches any of its elements."""
+    return value == expected or (isinstance(value, list) and expected in value)
+
 
 class FakeCollection:
     """Simple in-memory collection for development without MongoDB."""
@@ -21,53 +83,175 @@ class FakeCollection:
     def __init__(self, name):
         self.name = name
         self._data = {}
-    
-    def find_one(self, query):
-        for doc in self._data.values():
-            if all(doc.get(k) == v for k, v in query.items()):
-                return doc
+        # field -> value -> ids of the docs holding it
+        self._indexes = {}
+        # doc id -> insertion sequence, so index hits come back in _data order
+        self._order = {}
+        self._next_seq = 0
+
+    def _index_add(self, doc_id, doc):
+        for field, index in self._indexes.items():
+            for value in _index_keys(doc.get(field)):
+                index.setdefault(value, {})[doc_id] = None
+
+    def _index_remove(self, doc_id, doc):
+        for field, index in self._indexes.items():
+            for value in _index_keys(doc.get(field)):
+                ids = index.get(value)
+                if ids is not None:
+                    ids.pop(doc_id, None)
+                    if not ids:
+                        del index[value]
+
+    def _candidates(self, query):
+        """Docs that may match: looked up by _id or an indexed field, else every doc."""
+        for field, value in query.items():
+            if field != '_id' and field not in self._indexes:
+                continue
+            values = value['$in'] if isinstance(value, dict) and '$in' in value else [value]
+            if not all(_hashable(v) for v in values):
+                continue
+            if field == '_id':
+                ids = dict.fromkeys(values)
+            else:
+                index = self._indexes[field]
+                ids = {doc_id: None for v in values for doc_id in index.get(v, ())}
+            found = [doc_id for doc_id in ids if doc_id in self._data]
+            if len(found) > 1:
+                found.sort(key=self._order.__getitem__)
+            return [self._data[doc_id] for doc_id in found]
+        return list(self._data.values())
+
+    @staticmethod
+    def _matcher(query):
+        """Build the doc predicate for a query once per call, not once per doc."""
+        tests = [
+            (k, v['$in'], True) if isinstance(v, dict) and '$in' in v else (k, v, False)
+            for k, v in query.items()
+        ]
+        if len(tests) == 1:
+            # Most queries test a single field
+            k, v, is_in = tests[0]
+            if is_in:
+                return lambda doc: doc.get(k) in v
+            return lambda doc: _field_equals(doc.get(k), v)
+
+        def matches(doc):
+            for k, v, is_in in tests:
+                value = doc.get(k)
+                if (value not in v) if is_in else not _field_equals(value, v):
+                    return False
+            return True
+        return matches
+
+    def find_one(self, query, projection=None):
+        matches = self._matcher(query)
+        for doc in self._candidates(query):
+            if matches(doc):
+                return _apply_projection(doc, projection) if projection else doc
         return None
     
-    def find(self, query=None):
-        if query is None:
-            return FakeCursor(list(self._data.values()))
-        results = []
-        for doc in self._data.values():
-            if all(doc.get(k) == v for k, v in query.items()):
-                results.append(doc)
-        return FakeCursor(results)
+    def find(self, query=None, projection=None):
+        if not query:
+            return FakeCursor(list(self._data.values()), projection)
+        matches = self._matcher(query)
+        return FakeCursor([doc for doc in self._candidates(query) if matches(doc)], projection)
+
+    def create_index(self, keys, **kwargs):
+        # Hash index on the first key; enough for the equality lookups used here
+        field = keys if isinstance(keys, str) else keys[0][0]
+        if field != '_id' and field not in self._indexes:
+            self._indexes[field] = {}
+            for doc_id, doc in self._data.items():
+                for value in _index_keys(doc.get(field)):
+                    self._indexes[field].setdefault(value, {})[doc_id] = None
+        return keys if isinstance(keys, str) else '_'.join(f'{k}_{d}' for k, d in keys)
     
     def insert_one(self, doc):
         doc_id = doc.get('_id') or str(len(self._data) + 1)
         doc['_id'] = doc_id
+        if doc_id in self._data:
+            self._index_remove(doc_id, self._data[doc_id])
+        else:
+            self._order[doc_id] = self._next_seq
+            self._next_seq += 1
         self._data[doc_id] = doc
+        self._index_add(doc_id, doc)
         return type('InsertResult', (), {'inserted_id': doc_id})()
+
+    def insert_many(self, docs, ordered=True):
+        # Like Mongo: existing _ids are left untouched and reported once the
+        # rest are inserted (or at the first one when ordered)
+        ids = []
+        errors = []
+        for index, doc in enumerate(docs):
+            doc_id = doc.get('_id')
+            if doc_id is not None and doc_id in self._data:
+                errors.append({'index': index, 'code': 11000, 'errmsg': f'E11000 duplicate key error: _id {doc_id!r}', 'op': doc})
+                if ordered:
+                    break
+                continue
+            ids.append(self.insert_one(doc).inserted_id)
+        if errors:
+            raise BulkWriteError({
+                'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': len(ids),
+                'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': [],
+            })
+        return type('InsertManyResult', (), {'inserted_ids': ids})()
     
+    @staticmethod
+    def _apply_update(doc, update):
+        if '$set' in update:
+            doc.update(update['$set'])
+        if '$inc' in update:
+            for k, v in update['$inc'].items():
+                doc[k] = doc.get(k, 0) + v
+        if '$push' in update:
+            for k, v in update['$push'].items():
+                items = v['$each'] if isinstance(v, dict) and '$each' in v else [v]
+                doc.setdefault(k, []).extend(items)
+        if '$addToSet' in update:
+            for k, v in update['$addToSet'].items():
+                items = v['$each'] if isinstance(v, dict) and '$each' in v else [v]
+                current = doc.setdefault(k, [])
+                current.extend(item for item in items if item not in current)
+        if '$pull' in update:
+            for k, v in update['$pull'].items():
+                if isinstance(doc.get(k), list):
+                    doc[k] = [item for item in doc[k] if item != v]
+
     def update_one(self, query, update, upsert=False):
-        for doc_id, doc in self._data.items():
-            if all(doc.get(k) == v for k, v in query.items()):
-                if '$set' in update:
-                    doc.update(update['$set'])
-                if '$inc' in update:
-                    for k, v in update['$inc'].items():
-                        doc[k] = doc.get(k, 0) + v
+        matches = self._matcher(query)
+        for doc in self._candidates(query):
+            if matches(doc):
+                self._index_remove(doc['_id'], doc)
+                self._apply_update(doc, update)
+                self._index_add(doc['_id'], doc)
                 return type('UpdateResult', (), {'matched_count': 1, 'modified_count': 1})()
         # No match found — upsert if requested
         if upsert:
             new_doc = dict(query)
-            if '$set' in update:
-                new_doc.update(update['$set'])
-            if '$inc' in update:
-                for k, v in update['$inc'].items():
-                    new_doc[k] = v
+            self._apply_update(new_doc, update)
             self.insert_one(new_doc)
             return type('UpdateResult', (), {'matched_count': 0, 'modified_count': 0, 'upserted_id': new_doc.get('_id')})()
         return type('UpdateResult', (), {'matched_count': 0, 'modified_count': 0})()
     
+    def update_many(self, query, update):
+        matches = self._matcher(query)
+        docs = [doc for doc in self._candidates(query) if matches(doc)]
+        for doc in docs:
+            self._index_remove(doc['_id'], doc)
+            self._apply_update(doc, update)
+            self._index_add(doc['_id'], doc)
+        return type('UpdateResult', (), {'matched_count': len(docs), 'modified_count': len(docs)})()
+    
     def delete_one(self, query):
-        for doc_id, doc in list(self._data.items()):
-            if all(doc.get(k) == v for k, v in query.items()):
-                del self._data[doc_id]
+        matches = self._matcher(query)
+        for doc in self._candidates(query):
+            if matches(doc):
+                self._index_remove(doc['_id'], doc)
+                del self._data[doc['_id']]
+                del self._order[doc['_id']]
                 return type('DeleteResult', (), {'deleted_count': 1})()
         return type('DeleteResult', (), {'deleted_count': 0})()
     
@@ -80,37 +264,78 @@ class FakeCollection:
         if not query:
             count = len(self._data)
             self._data.clear()
+            self._order.clear()
+            for index in self._indexes.values():
+                index.clear()
             return type('DeleteResult', (), {'deleted_count': count})()
-        to_delete = []
-        for doc_id, doc in self._data.items():
-            if all(doc.get(k) == v for k, v in query.items()):
-                to_delete.append(doc_id)
-        for doc_id in to_delete:
-            del self._data[doc_id]
+        matches = self._matcher(query)
+        to_delete = [doc for doc in self._candidates(query) if matches(doc)]
+        for doc in to_delete:
+            self._index_remove(doc['_id'], doc)
+            del self._data[doc['_id']]
+            del self._order[doc['_id']]
         return type('DeleteResult', (), {'deleted_count': len(to_delete)})()
 
 
+def _eval_projection_expr(doc, expr):
+    """Evaluate the small subset of aggregation expressions used in projections."""
+    if isinstance(expr, str) and expr.startswith('$'):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict):
+        if '$size' in expr:
+            return len(_eval_projection_expr(doc, expr['$size']))
+        if '$ifNull' in expr:
+            value, default = expr['$ifNull']
+            result = _eval_projection_expr(doc, value)
+            return default if result is None else result
+    return expr
+
+
+def _apply_projection(doc, projection):
+    """Apply an inclusion projection (with optional computed fields) to a document."""
+    out = {}
+    if projection.get('_id', 1):
+        out['_id'] = doc.get('_id')
+    for field, spec in projection.items():
+        if field == '_id':
+            continue
+        if isinstance(spec, dict):
+            out[field] = _eval_projection_expr(doc, spec)
+        elif spec and field in doc:
+            out[field] = doc[field]
+    return out
+
+
 class FakeCursor:
     """Fake cursor for in-memory queries."""
     
-    def __init__(self, results):
+    def __init__(self, results, projection=None):
         self._results = results
+        self._projection = projection
     
     def sort(self, key, direction=1):
+        def sort_key(doc):
+            # One lookup per doc; missing and None values sort as ''
+            value = doc.get(key)
+            return '' if value is None else value
+
         try:
-            self._results.sort(
-                key=lambda x: x.get(key, '') if not isinstance(key, str) or x.get(key) is not None else '',
-                reverse=(direction == -1)
-            )
+            self._results.sort(key=sort_key, reverse=(direction == -1))
         except TypeError:
             pass  # Gracefully handle uncomparable values
         return self
     
+    def skip(self, n):
+        self._results = self._results[n:]
+        return self
+
     def limit(self, n):
         self._results = self._results[:n]
         return self
     
     def __iter__(self):
+        if self._projection:
+            return (_apply_projection(doc, self._projection) for doc in self._results)
         return iter(self._results)
     
     def __len__(self):
@@ -133,48 +358,117 @@ class FakeDB:
 
 def use_fake_db() -> bool:
     """Check if we should use fake/in-memory DB."""
-    return os.getenv('USE_FAKE_DB', '0') == '1'
+    return USE_FAKE_DB
 
 
 def get_mongo_client():
-    """Return a MongoClient. Falls back to fake if MongoDB unavailable."""
-    global _client
+    """Return the shared MongoClient, or None when the in-memory DB is configured.
+
+    The client (and its connection pool) is created once per process and
+    reused by every request. With DATABASE_URL set, a failed connection
+    raises instead of falling back to the fake DB; the failure is remembered
+    for MONGO_RETRY_BACKOFF_SECONDS so requests don't each wait out the
+    server selection timeout, then the next call tries again.
+    """
+    global _client, _client_unconfigured, _client_error, _client_failed_at
     
-    if use_fake_db():
-        logger.info('Using in-memory fake database (USE_FAKE_DB=1)')
+    if use_fake_db() or _client_unconfigured:
         return None
     
     if _client is None:
-        try:
-            from pymongo import MongoClient
-            mongo_uri = os.getenv('DATABASE_URL')
-            if not mongo_uri:
-                logger.warning('DATABASE_URL not set, falling back to fake DB')
-                return None
-            
-            _client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-            # Force a server selection to surface auth/connect errors early
-            _client.server_info()
-            logger.info('Connected to MongoDB')
-        except Exception as e:
-            logger.warning('Could not connect to MongoDB: %s. Using fake DB.', e)
-            return None
+        with _client_lock:
+            if _client is None:
+                mongo_uri = os.getenv('DATABASE_URL')
+                if not mongo_uri:
+                    logger.warning('DATABASE_URL not set, falling back to fake DB')
+                    _client_unconfigured = True
+                    return None
+
+                if _client_error is not None and time.monotonic() - _client_failed_at < MONGO_RETRY_BACKOFF_SECONDS:
+                    raise ConnectionError(f'MongoDB unavailable: {_client_error}') from _client_error
+
+                client = None
+                try:
+                    from pymongo import MongoClient
+                    client = MongoClient(
+                        mongo_uri,
+                        serverSelectionTimeoutMS=5000,
+                        maxPoolSize=MONGO_MAX_POOL_SIZE,
+                        minPoolSize=MONGO_MIN_POOL_SIZE,
+                        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                        retryWrites=True,
+                        compressors=os.getenv('MONGO_COMPRESSORS', _mongo_compressors()),
+                    )
+                    # Force a server selection to surface auth/connect errors early
+                    client.server_info()
+                except Exception as e:
+                    logger.error('Could not connect to MongoDB: %s (retrying in %ss)', e, MONGO_RETRY_BACKOFF_SECONDS)
+                    if client is not None:
+                        client.close()
+                    _client_error = e
+                    _client_failed_at = time.monotonic()
+                    raise
+                _client = client
+                _client_error = None
+                logger.info('Connected to MongoDB')
     
     return _client
 
 
+def close_mongo_client():
+    """Close the shared MongoClient and release its pooled connections."""
+    global _client, _db
+    with _db_lock:
+        _db = None
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+            logger.info('Closed MongoDB connection')
+
+
+def ensure_indexes(db=None):
+    """Create the indexes used by hot queries. Safe to call repeatedly."""
+    db = db if db is not None else get_db()
+    indexes = [
+        (db.chat_sessions, [("updated_at", -1)], {}),
+        (db.chat_sessions, "session_id", {"unique": True}),
+        (db.ingestion_jobs, [("created_at", -1)], {}),
+        (db.ingestion_jobs, "job_id", {"unique": True}),
+        (db.chunk_hashes, "job_ids", {}),
+        (db.users, "username", {"unique": True}),
+        (db.users, "client_id", {}),
+        (db.clients, "enl_id", {"unique": True}),
+        (db.settings, "key", {}),
+    ]
+    for collection, keys, options in indexes:
+        try:
+            collection.create_index(keys, **options)
+        except Exception as e:
+            logger.warning('Could not create index %s on %s: %s', keys, collection.name, e)
+
+
 def get_db():
-    """Get database instance - real MongoDB or fake in-memory."""
-    global _fake_db
-    
+    """Get database instance - real MongoDB or fake in-memory.
+
+    Only the real database handle is cached; the fake is re-resolved on each
+    call so a process that starts without MongoDB picks it up once reachable.
+    """
+    global _db, _fake_db
+    db = _db
+    if db is not None:
+        return db
+
     client = get_mongo_client()
-    
-    if client is None:
+    with _db_lock:
+        if client is not None:
+            if _db is None:
+                _db = client[MONGODB_DATABASE]
+            return _db
         # Use fake database
         if _fake_db is None:
             _fake_db = FakeDB()
+            ensure_indexes(_fake_db)
             logger.info('Initialized in-memory database')
         return _fake_db
-    
-    db_name = os.getenv('MONGODB_DATABASE', 'web_crawler')
-    return client[db_name]
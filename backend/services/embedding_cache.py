@@ -0,0 +1,101 @@
+"""
+Persistent cache of document embeddings, keyed by a hash of model and text.
+
+Lets a re-ingest of unchanged content (including after a reset) skip the
+embedding model. Stored as float16 in a local SQLite file;
+EMBEDDING_CACHE_PATH=off disables it.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite3")
+# Stay well under SQLite's bound-parameter limit per lookup
+LOOKUP_BATCH_SIZE = 500
+# Half the bytes of float32, with negligible effect on cosine similarity
+STORAGE_DTYPE = np.float16
+
+_conn = None
+_unavailable = False
+_lock = threading.Lock()
+
+
+def _get_conn():
+    """Open the cache database on first use; None when disabled or unavailable."""
+    global _conn, _unavailable
+    if _conn is None and not _unavailable:
+        if EMBEDDING_CACHE_PATH.lower() in ("", "off", "none"):
+            _unavailable = True
+            return None
+        try:
+            Path(EMBEDDING_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(EMBEDDING_CACHE_PATH, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            _conn = conn
+        except Exception as e:
+            logger.warning("Embedding cache not available: %s", e)
+            _unavailable = True
+            return None
+    return _conn
+
+
+def cache_key(model_id: str, text: str) -> str:
+    """Content address of one text under one embedding model."""
+    # blake2b is markedly cheaper than SHA-256 for short chunks; 128 bits is plenty for a cache
+    return hashlib.blake2b(f"{model_id}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_many(keys: List[str]) -> Dict[str, np.ndarray]:
+    """Return the cached vectors (as float32) for whichever keys are present."""
+    found = {}
+    with _lock:
+        conn = _get_conn()
+        if conn is None:
+            return found
+        try:
+            for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=STORAGE_DTYPE).astype(np.float32)
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache lookup failed: %s", e)
+    return found
+
+
+def put_many(items: Iterable[Tuple[str, np.ndarray]]):
+    """Store vectors (as float16 bytes) under their keys."""
+    with _lock:
+        conn = _get_conn()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    ((key, np.asarray(vector, dtype=STORAGE_DTYPE).tobytes()) for key, vector in items)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache write failed: %s", e)
+
+
+def close():
+    """Close the cache database."""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
@@ -2,25 +2,149 @@
 Generate embeddings for text chunks.
 Supports OpenAI, Google, and local HuggingFace embeddings.
 """
-from typing import List
+from typing import List, Union
 import os
 import time
+import random
 import logging
+import threading
+
+import numpy as np
+
+from backend.services import embedding_cache
 
 logger = logging.getLogger(__name__)
 
 # Global model cache to avoid reloading
 _local_model = None
+_local_model_lock = threading.Lock()
+
+# Texts per generate_embeddings_batch call. The local model amortizes its
+# forward pass over large batches (and length-sorts them internally); the
+# OpenAI/Google APIs take up to 100 inputs per request.
+LOCAL_BATCH_SIZE = 256
+API_BATCH_SIZE = 100
+# Forward-pass size inside one local encode() call. encode() sorts its input
+# by length, so each mini-batch pads only to its own longest text.
+LOCAL_ENCODE_BATCH_SIZE = int(os.getenv("EMBEDDING_ENCODE_BATCH_SIZE", "64"))
+
+# Ceiling on one retry wait
+RETRY_MAX_DELAY = 30
+
+LOCAL_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# torch runs the model in PyTorch (optionally quantized per EMBEDDING_QUANT);
+# onnx/openvino load the int8 exports shipped with the model. The default
+# ONNX file targets AVX-512 VNNI CPUs; pick another export (or torch) elsewhere.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_QUANT = os.getenv("EMBEDDING_QUANT", "off").lower()
+# cuda, cpu, mps...; unset lets sentence-transformers use CUDA when available
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None
+# Intra-op threads for local inference; unset uses half the usable CPUs
+# (roughly the physical cores), since hyperthreads contend on matmul units
+TORCH_NUM_THREADS = os.getenv("TORCH_NUM_THREADS")
+EMBEDDING_MODEL_FILES = {
+    "onnx": os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx"),
+    "openvino": os.getenv("EMBEDDING_OPENVINO_FILE", "openvino/openvino_model_qint8_quantized.xml"),
+}
+
+
+def local_model_id() -> str:
+    """Name of the vectors the local model produces under the configured backend."""
+    if EMBEDDING_BACKEND in EMBEDDING_MODEL_FILES:
+        return f"local/{LOCAL_MODEL_NAME}/{EMBEDDING_BACKEND}/{EMBEDDING_MODEL_FILES[EMBEDDING_BACKEND]}"
+    return f"local/{LOCAL_MODEL_NAME}/{EMBEDDING_QUANT}"
+
 
 def get_local_model():
-    """Lazy load the local embedding model."""
+    """Lazy load the local embedding model on EMBEDDING_BACKEND (torch|onnx|openvino)."""
     global _local_model
     if _local_model is None:
-        from sentence_transformers import SentenceTransformer
-        _local_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Concurrent first requests wait for one load instead of each loading a copy
+        with _local_model_lock:
+            if _local_model is None:
+                _local_model = _load_local_model()
     return _local_model
 
 
+def _local_threads() -> int:
+    """Intra-op threads for local inference: TORCH_NUM_THREADS, else half the usable CPUs."""
+    if TORCH_NUM_THREADS:
+        return int(TORCH_NUM_THREADS)
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    return max(1, cpus // 2)
+
+
+def _set_torch_threads(threads: int):
+    """Size torch's thread pools before the first tensor op."""
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        # Each encode() is one op chain; inter-op threads would only oversubscribe
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed once any parallel work has run
+    logger.info("Local embedding model using %d torch threads", threads)
+
+
+def _onnx_session_options(threads: int):
+    """ONNX Runtime options: every graph optimization (fusions, constant folding, layout) and sized thread pools."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    return options
+
+
+def _load_local_model():
+    """Build the SentenceTransformer for the configured backend and quantization."""
+    threads = _local_threads()
+    _set_torch_threads(threads)
+    from sentence_transformers import SentenceTransformer
+
+    if EMBEDDING_BACKEND in EMBEDDING_MODEL_FILES:
+        # Pre-quantized int8 graph; the encode() API is unchanged
+        model_kwargs = {"file_name": EMBEDDING_MODEL_FILES[EMBEDDING_BACKEND]}
+        if EMBEDDING_BACKEND == "onnx":
+            model_kwargs["session_options"] = _onnx_session_options(threads)
+        return SentenceTransformer(
+            LOCAL_MODEL_NAME,
+            device=EMBEDDING_DEVICE,
+            backend=EMBEDDING_BACKEND,
+            model_kwargs=model_kwargs
+        )
+    if EMBEDDING_BACKEND != "torch":
+        logger.warning("Unknown EMBEDDING_BACKEND=%s; expected torch, onnx or openvino", EMBEDDING_BACKEND)
+
+    model = SentenceTransformer(LOCAL_MODEL_NAME, device=EMBEDDING_DEVICE)
+
+    if EMBEDDING_QUANT == "int8":
+        # Dynamic int8 Linear layers: ~2x faster CPU inference
+        import torch
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif EMBEDDING_QUANT == "fp16":
+        if model.device.type == "cuda":
+            model = model.half()
+        else:
+            logger.warning("EMBEDDING_QUANT=fp16 needs a CUDA device; keeping fp32 on %s", model.device)
+    elif EMBEDDING_QUANT != "off":
+        logger.warning("Unknown EMBEDDING_QUANT=%s; expected off, int8 or fp16", EMBEDDING_QUANT)
+
+    return model
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts, server and connection errors; not bad requests or auth failures."""
+    # OpenAI errors carry status_code, google.api_core errors an HTTP code
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if not isinstance(status, int):
+        return True
+    return status in (408, 409, 429) or status >= 500
+
+
 class EmbeddingService:
     def __init__(self):
         self.provider = os.getenv("EMBEDDING_PROVIDER", os.getenv("LLM_PROVIDER", "local")).lower()
@@ -32,23 +156,35 @@ class EmbeddingService:
             # Groq doesn't have embeddings, use local (lazy loaded)
             self.provider = "local"
             self.model = None  # Will be loaded on first use
+            self.optimal_batch_size = LOCAL_BATCH_SIZE
         elif self.provider == "google":
             import google.generativeai as genai
             api_key = os.getenv("GOOGLE_API_KEY")
             if not api_key:
                 raise ValueError("GOOGLE_API_KEY environment variable is not set")
             genai.configure(api_key=api_key)
+            self._genai = genai
             self.model = os.getenv("GOOGLE_EMBEDDING_MODEL", "models/embedding-001")
+            self.optimal_batch_size = API_BATCH_SIZE
         else:  # openai
             from openai import OpenAI
+            from backend.services.llm_service import get_http_client
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY environment variable is not set")
-            self.client = OpenAI(api_key=api_key)
+            self.client = OpenAI(api_key=api_key, http_client=get_http_client())
             self.model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+            self.optimal_batch_size = API_BATCH_SIZE
+
+        # Names the vectors this service produces, so cached embeddings are
+        # never reused across models (or local backends and quantization modes)
+        if self.provider == "local":
+            self.model_id = local_model_id()
+        else:
+            self.model_id = f"{self.provider}/{self.model}"
 
-    def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for single text."""
+    def generate_embedding(self, text: str) -> Union[np.ndarray, List[float]]:
+        """Generate embedding for single text (a float32 array for the local provider)."""
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
 
@@ -56,11 +192,9 @@ class EmbeddingService:
             try:
                 if self.provider == "local":
                     model = get_local_model()
-                    embedding = model.encode(text)
-                    return embedding.tolist()
+                    return model.encode(text, convert_to_numpy=True)
                 elif self.provider == "google":
-                    import google.generativeai as genai
-                    result = genai.embed_content(
+                    result = self._genai.embed_content(
                         model=self.model,
                         content=text,
                         task_type="retrieval_document"
@@ -73,22 +207,58 @@ class EmbeddingService:
                     )
                     return response.data[0].embedding
             except Exception as e:
-                if attempt < self.max_retries - 1:
+                if attempt < self.max_retries - 1 and _is_retryable(e):
                     logger.warning("Error generating embedding (attempt %d): %s", attempt + 1, e)
-                    time.sleep(self.retry_delay * (attempt + 1))
+                    time.sleep(self._backoff(attempt))
                 else:
                     raise
 
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
-        """Generate embeddings for multiple texts in batches."""
+    def generate_query_embeddings(self, texts: List[str]) -> Union[np.ndarray, List[List[float]]]:
+        """Embed a batch of queries in one provider call, bypassing the document cache.
+
+        The local provider returns a float32 numpy matrix (one row per text).
+        """
+        return self._embed_texts(texts, API_BATCH_SIZE)
+
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = API_BATCH_SIZE) -> Union[np.ndarray, List[List[float]]]:
+        """Generate embeddings for multiple texts, reusing cached vectors for texts seen before.
+
+        The local provider returns a float32 numpy matrix (one row per text).
+        """
         if not texts:
             return []
 
-        # For local embeddings, process all at once (much faster)
+        keys = [embedding_cache.cache_key(self.model_id, text) for text in texts]
+        cached = embedding_cache.get_many(list(dict.fromkeys(keys)))
+        # Embed each distinct uncached text once (crawls repeat navbar/footer
+        # chunks); its repeats reuse the vector
+        first = {}
+        for i, key in enumerate(keys):
+            if key not in cached:
+                first.setdefault(key, i)
+        fresh = self._embed_texts([texts[i] for i in first.values()], batch_size) if first else []
+        embedding_cache.put_many((key, embedding) for key, embedding in zip(first, fresh) if embedding is not None)
+        if len(first) == len(texts):
+            return fresh
+
+        if self.provider == "local":
+            vectors = dict(cached)
+            vectors.update(zip(first, fresh))
+            return np.stack([vectors[key] for key in keys])
+
+        vectors = {key: vector.tolist() for key, vector in cached.items()}
+        vectors.update(zip(first, fresh))
+        return [vectors[key] for key in keys]
+
+    def _embed_texts(self, texts: List[str], batch_size: int = API_BATCH_SIZE) -> Union[np.ndarray, List[List[float]]]:
+        """Embed texts with the provider; failed API batches come back as None rows."""
+
+        # For local embeddings, process all at once (much faster) and skip
+        # the per-row conversion to Python floats. One call lets encode()
+        # length-sort the whole list instead of each caller-sized slice.
         if self.provider == "local":
             model = get_local_model()
-            embeddings = model.encode(texts)
-            return [e.tolist() for e in embeddings]
+            return model.encode(texts, batch_size=LOCAL_ENCODE_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False)
 
         all_embeddings = []
 
@@ -99,8 +269,7 @@ class EmbeddingService:
             for attempt in range(self.max_retries):
                 try:
                     if self.provider == "google":
-                        import google.generativeai as genai
-                        result = genai.embed_content(
+                        result = self._genai.embed_content(
                             model=self.model,
                             content=batch,
                             task_type="retrieval_document"
@@ -116,16 +285,21 @@ class EmbeddingService:
                         all_embeddings.extend(batch_embeddings)
                     break
                 except Exception as e:
-                    if attempt < self.max_retries - 1:
+                    if attempt < self.max_retries - 1 and _is_retryable(e):
                         logger.warning("Error in batch %d (attempt %d): %s", i//batch_size + 1, attempt + 1, e)
-                        time.sleep(self.retry_delay * (attempt + 1))
+                        time.sleep(self._backoff(attempt))
                     else:
                         logger.error("Failed to process batch %d: %s", i//batch_size + 1, e)
                         # Add None placeholders for failed batch
                         all_embeddings.extend([None] * len(batch))
+                        break
 
         return all_embeddings
 
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so rate-limited workers do not retry in lockstep."""
+        return random.uniform(0, min(RETRY_MAX_DELAY, self.retry_delay * 2 ** attempt))
+
 
 # Usage example
 if __name__ == "__main__":
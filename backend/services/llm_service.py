@@ -4,10 +4,67 @@ Supports OpenAI, Google Gemini, and Groq.
 """
 import os
 import logging
+import threading
 from typing import List, Dict, Optional
 
+from backend.data_ingestion.chunker import get_encoding
+
 logger = logging.getLogger(__name__)
 
+# Deployment-wide prompt override, read once; each method keeps its own default
+SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT")
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful AI assistant for this website. "
+    "Use the provided context to answer the user's question as accurately as possible. "
+    "If the context contains relevant information, prioritize it. "
+    "If the context is incomplete or missing key details, supplement with your general knowledge and clearly indicate you are doing so. "
+    "Always aim to give a useful, informative answer rather than simply saying you don't know."
+)
+DEFAULT_STREAM_SYSTEM_PROMPT = "You are a helpful AI assistant. Answer questions based on the provided context."
+
+# Conversation history is trimmed to the newest messages that fit in what the
+# model's context has left after the prompt and the reserved completion,
+# and never more than HISTORY_TOKEN_BUDGET
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "8192"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+# Role and separator tokens each chat message adds
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# One connection pool for every OpenAI-compatible client (chat and
+# embeddings, OpenAI and Groq), so requests reuse warm TLS connections
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the shared httpx client, multiplexing over HTTP/2 when h2 is installed."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                import httpx
+                try:
+                    import h2  # noqa: F401
+                    http2 = True
+                except ImportError:
+                    http2 = False
+                # The SDK still applies its own per-request timeouts
+                _http_client = httpx.Client(
+                    http2=http2,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                    follow_redirects=True
+                )
+    return _http_client
+
+
+def close_http_client():
+    """Close the shared httpx client's connections."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
 
 class LLMService:
     def __init__(self):
@@ -31,7 +88,8 @@ class LLMService:
                 raise ValueError("GROQ_API_KEY environment variable is not set")
             self.client = OpenAI(
                 api_key=api_key,
-                base_url="https://api.groq.com/openai/v1"
+                base_url="https://api.groq.com/openai/v1",
+                http_client=get_http_client()
             )
             self.model = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
         else:  # openai
@@ -39,9 +97,34 @@ class LLMService:
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY environment variable is not set")
-            self.client = OpenAI(api_key=api_key)
+            self.client = OpenAI(api_key=api_key, http_client=get_http_client())
             self.model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 
+    def _count_tokens(self, text: str) -> int:
+        """Token count of text (approximate for non-OpenAI models)."""
+        encoding = get_encoding()
+        if encoding is None:
+            return len(text) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def _fit_history(self, conversation_history: Optional[List[Dict]], *prompt_parts: str) -> List[Dict]:
+        """Newest history messages, in order, whose tokens fit beside the rest of the prompt."""
+        if not conversation_history:
+            return []
+
+        budget = min(
+            HISTORY_TOKEN_BUDGET,
+            MODEL_CONTEXT_TOKENS - self.max_tokens - sum(self._count_tokens(part) for part in prompt_parts)
+        )
+        kept = []
+        for msg in reversed(conversation_history):
+            budget -= self._count_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if budget < 0:
+                break
+            kept.append(msg)
+        kept.reverse()
+        return kept
+
     def generate_response(
         self,
         query: str,
@@ -51,14 +134,8 @@ class LLMService:
     ) -> str:
         """Generate response using LLM."""
         if not system_prompt:
-            system_prompt = os.getenv(
-                "SYSTEM_PROMPT",
-                "You are a helpful AI assistant for this website. "
-                "Use the provided context to answer the user's question as accurately as possible. "
-                "If the context contains relevant information, prioritize it. "
-                "If the context is incomplete or missing key details, supplement with your general knowledge and clearly indicate you are doing so. "
-                "Always aim to give a useful, informative answer rather than simply saying you don't know."
-            )
+            system_prompt = DEFAULT_SYSTEM_PROMPT if SYSTEM_PROMPT is None else SYSTEM_PROMPT
+        conversation_history = self._fit_history(conversation_history, system_prompt, context, query)
 
         try:
             if self.provider == "google":
@@ -66,7 +143,7 @@ class LLMService:
                 prompt_parts = [system_prompt, "\n\n"]
 
                 if conversation_history:
-                    for msg in conversation_history[-10:]:
+                    for msg in conversation_history:
                         role = "User" if msg["role"] == "user" else "Assistant"
                         prompt_parts.append(f"{role}: {msg['content']}\n")
 
@@ -92,7 +169,7 @@ class LLMService:
                 ]
 
                 if conversation_history:
-                    messages.extend(conversation_history[-10:])
+                    messages.extend(conversation_history)
 
                 user_message = f"""Context information:
 {context}
@@ -120,13 +197,13 @@ Please answer the question based on the context provided above. If the informati
         self,
         query: str,
         context: str,
-        conversation_history: Optional[List[Dict]] = None
+        conversation_history: Optional[List[Dict]] = None,
+        system_prompt: Optional[str] = None
     ):
         """Generate streaming response using LLM."""
-        system_prompt = os.getenv(
-            "SYSTEM_PROMPT",
-            "You are a helpful AI assistant. Answer questions based on the provided context."
-        )
+        if not system_prompt:
+            system_prompt = DEFAULT_STREAM_SYSTEM_PROMPT if SYSTEM_PROMPT is None else SYSTEM_PROMPT
+        conversation_history = self._fit_history(conversation_history, system_prompt, context, query)
 
         try:
             if self.provider == "google":
@@ -134,7 +211,7 @@ Please answer the question based on the context provided above. If the informati
                 prompt_parts = [system_prompt, "\n\n"]
 
                 if conversation_history:
-                    for msg in conversation_history[-10:]:
+                    for msg in conversation_history:
                         role = "User" if msg["role"] == "user" else "Assistant"
                         prompt_parts.append(f"{role}: {msg['content']}\n")
 
@@ -159,7 +236,7 @@ Please answer the question based on the context provided above. If the informati
                 ]
 
                 if conversation_history:
-                    messages.extend(conversation_history[-10:])
+                    messages.extend(conversation_history)
 
                 user_message = f"""Context:\n{context}\n\nQuestion: {query}"""
                 messages.append({"role": "user", "content": user_message})
@@ -0,0 +1,114 @@
+"""
+Semantic cache of vector search results, keyed by query embedding.
+
+A query whose embedding is within SEARCH_CACHE_SIMILARITY (cosine) of a
+recent query with the same search parameters reuses that query's results.
+Entries expire after SEARCH_CACHE_TTL seconds so writes made by other
+processes show up; writes through the owning store clear it outright.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_SIMILARITY = float(os.getenv("SEARCH_CACHE_SIMILARITY", "0.97"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+
+
+class SemanticSearchCache:
+    """Bounded LRU of (query vector, results); lookups are one matrix-vector product."""
+
+    def __init__(self, size: int = SEARCH_CACHE_SIZE, similarity: float = SEARCH_CACHE_SIMILARITY, ttl: float = SEARCH_CACHE_TTL):
+        self.size = max(0, size)
+        self.similarity = similarity
+        self.ttl = ttl
+        self._vectors = None  # (size, dim) unit rows, allocated on first put
+        self._valid = np.zeros(self.size, dtype=bool)
+        self._keys = [None] * self.size
+        self._entries = [None] * self.size  # (results, expires_at) per slot
+        self._lru = OrderedDict()  # slot -> None, most recently used last
+        self._lock = threading.Lock()
+        # Bumped by clear(); results computed before a clear are stale
+        self.generation = 0
+
+    @staticmethod
+    def _unit(vector) -> Optional[np.ndarray]:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def get(self, vector, key: Hashable) -> Optional[Dict]:
+        """Results of the most similar live entry with the same key, or None."""
+        if not self.size:
+            return None
+        query = self._unit(vector)
+        with self._lock:
+            if query is None or not self._lru or self._vectors is None or query.shape[0] != self._vectors.shape[1]:
+                return None
+            scores = self._vectors @ query
+            scores[~self._valid] = -np.inf
+            now = time.monotonic()
+            # Best candidates first; stop at the first below the threshold
+            for slot in np.argsort(scores)[::-1]:
+                if scores[slot] < self.similarity:
+                    return None
+                if self._keys[slot] != key:
+                    continue
+                results, expires_at = self._entries[slot]
+                if expires_at < now:
+                    self._drop(slot)
+                    continue
+                self._lru.move_to_end(slot)
+                return results
+        return None
+
+    def put(self, vector, key: Hashable, results: Dict, generation: Optional[int] = None):
+        """Remember results for a query vector, evicting the least recently used entry when full.
+
+        Pass the generation read before running the search; results from
+        before a clear() are dropped instead of cached.
+        """
+        if not self.size:
+            return
+        query = self._unit(vector)
+        if query is None:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if self._vectors is None or query.shape[0] != self._vectors.shape[1]:
+                # First entry (or a new embedding model) fixes the dimension
+                self._vectors = np.zeros((self.size, query.shape[0]), dtype=np.float32)
+                self._reset()
+            if len(self._lru) < self.size:
+                slot = int(np.flatnonzero(~self._valid)[0])
+            else:
+                slot, _ = self._lru.popitem(last=False)
+            self._vectors[slot] = query
+            self._valid[slot] = True
+            self._keys[slot] = key
+            self._entries[slot] = (results, time.monotonic() + self.ttl)
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def clear(self):
+        """Forget every entry (the underlying collection changed)."""
+        with self._lock:
+            self.generation += 1
+            self._reset()
+
+    def _reset(self):
+        self._valid[:] = False
+        self._keys = [None] * self.size
+        self._entries = [None] * self.size
+        self._lru.clear()
+
+    def _drop(self, slot: int):
+        self._valid[slot] = False
+        self._keys[slot] = None
+        self._entries[slot] = None
+        self._lru.pop(slot, None)
@@ -3,22 +3,130 @@ Vector store for document embeddings.
 Supports ChromaDB (local) and Pinecone (cloud) with tenant isolation.
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
+import copy
+import hashlib
+import json
 import os
+import re
 import shutil
 import sqlite3
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from cachetools import LRUCache
 from dotenv import load_dotenv
 
+from backend.services.search_cache import SemanticSearchCache
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+VECTOR_STORE_TYPE = os.getenv('VECTOR_STORE_TYPE', 'chroma').lower()
+# On Vercel (serverless), only /tmp is writable
+CHROMA_PERSIST_DIRECTORY = (
+    '/tmp/chroma_db' if os.getenv('VERCEL') or os.getenv('VERCEL_ENV')
+    else os.getenv('CHROMA_PERSIST_DIRECTORY', './data/chroma_db')
+)
+CHROMA_COLLECTION_NAME = os.getenv('CHROMA_COLLECTION_NAME', 'website_docs')
+PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
+PINECONE_INDEX_NAME = os.getenv('PINECONE_INDEX_NAME', 'website-docs')
+PINECONE_ENVIRONMENT = os.getenv('PINECONE_ENVIRONMENT', 'us-east-1')
+
+# Give each client its own Chroma collection so a search only walks that
+# client's index instead of post-filtering a shared one. Vectors already in
+# the shared collection are not moved; re-ingest after enabling.
+CHROMA_PARTITION_BY_CLIENT = os.getenv('CHROMA_PARTITION_BY_CLIENT', 'false').lower() == 'true'
+CLIENT_STORE_CACHE_SIZE = 256
+# Rows per collection.add call, further capped by the Chroma client's own limit
+CHROMA_ADD_CHUNK = int(os.getenv('CHROMA_ADD_CHUNK', '5000'))
+# Vectors per Pinecone upsert request, and requests in flight per add
+PINECONE_UPSERT_BATCH = 100
+PINECONE_UPSERT_WORKERS = 8
+# Metadata value types Pinecone accepts
+PINECONE_METADATA_TYPES = (str, int, float, bool)
+PARTITION_SEPARATOR = '__'
+# Per-query fields of a Chroma-style result
+RESULT_FIELDS = ('ids', 'documents', 'metadatas', 'distances')
+
+_SAFE_CLIENT_ID = re.compile(r'^[A-Za-z0-9_-]{1,40}$')
+
+# Chroma clients shared by every VectorStore, keyed by persist directory
+_chroma_clients = {}
+_chroma_clients_lock = threading.Lock()
+
+
+def _get_chroma_client(persist_dir: str):
+    """Return the process-wide Chroma client for persist_dir, opening it on first use."""
+    with _chroma_clients_lock:
+        client = _chroma_clients.get(persist_dir)
+        if client is not None:
+            return client
+
+        import chromadb
+        from chromadb.config import Settings
+
+        try:
+            client = chromadb.PersistentClient(
+                path=persist_dir,
+                settings=Settings(anonymized_telemetry=False)
+            )
+        except Exception as e:
+            logger.warning('PersistentClient failed, trying Client: %s', e)
+            try:
+                settings = Settings(persist_directory=persist_dir, anonymized_telemetry=False)
+                client = chromadb.Client(settings)
+            except Exception as e2:
+                logger.exception('Failed to initialize chromadb client: %s', e2)
+                raise
+
+        _chroma_clients[persist_dir] = client
+        return client
+
+
+def client_collection_name(base_name: str, client_id: str) -> str:
+    """Chroma collection name holding one client's vectors."""
+    client_id = str(client_id)
+    if not _SAFE_CLIENT_ID.match(client_id):
+        # Keep names within Chroma's charset and length limits
+        client_id = hashlib.sha256(client_id.encode('utf-8')).hexdigest()[:32]
+    return f'{base_name}{PARTITION_SEPARATOR}{client_id}'
+
+
+def _empty_results(rows: int) -> Dict:
+    """Chroma-style result with no matches for each of `rows` queries."""
+    return {'documents': [[] for _ in range(rows)], 'metadatas': [[] for _ in range(rows)], 'distances': [[] for _ in range(rows)]}
+
+
+def _merge_by_distance(results: List[Dict], rows: int, top_k: int) -> Dict:
+    """Merge Chroma-style results for the same queries, keeping the top_k nearest per query."""
+    fields = [name for name in RESULT_FIELDS if all(isinstance(r.get(name), list) for r in results)]
+    merged = {name: [] for name in fields}
+    for i in range(rows):
+        hits = [
+            (distance, r, k)
+            for r in results if i < len(r['distances'])
+            for k, distance in enumerate(r['distances'][i])
+        ]
+        hits.sort(key=lambda hit: hit[0])
+        for name in fields:
+            merged[name].append([r[name][i][k] for _, r, k in hits[:top_k]])
+    return merged
+
 
 class VectorStore:
     def __init__(self):
-        self.store_type = os.getenv('VECTOR_STORE_TYPE', 'chroma').lower()
-        
+        self.store_type = VECTOR_STORE_TYPE
+        # Set on the per-client views returned by get_collection
+        self.client_id = None
+        self._client_stores = LRUCache(maxsize=CLIENT_STORE_CACHE_SIZE)
+        self._client_stores_lock = threading.Lock()
+        self._search_cache = SemanticSearchCache()
+        # On per-client views, the unscoped store's cache, whose results span every client
+        self._unscoped_search_cache = None
+
         if self.store_type == 'pinecone':
             self._init_pinecone()
         else:
@@ -27,35 +135,17 @@ class VectorStore:
     def _init_chromadb(self):
         """Initialize ChromaDB (local vector store)."""
         try:
-            import chromadb
-            from chromadb.config import Settings
+            import chromadb  # noqa: F401
         except ImportError as e:
             logger.error('chromadb is required but not installed: %s', e)
             raise
 
-        persist_dir = os.getenv('CHROMA_PERSIST_DIRECTORY', './data/chroma_db')
-        # On Vercel (serverless), only /tmp is writable
-        if os.getenv('VERCEL') or os.getenv('VERCEL_ENV'):
-            persist_dir = '/tmp/chroma_db'
-        collection_name = os.getenv('CHROMA_COLLECTION_NAME', 'website_docs')
+        persist_dir = CHROMA_PERSIST_DIRECTORY
+        collection_name = CHROMA_COLLECTION_NAME
 
         os.makedirs(persist_dir, exist_ok=True)
 
-        # Initialize client
-        client = None
-        try:
-            client = chromadb.PersistentClient(
-                path=persist_dir,
-                settings=Settings(anonymized_telemetry=False)
-            )
-        except Exception as e:
-            logger.warning('PersistentClient failed, trying Client: %s', e)
-            try:
-                settings = Settings(persist_directory=persist_dir, anonymized_telemetry=False)
-                client = chromadb.Client(settings)
-            except Exception as e2:
-                logger.exception('Failed to initialize chromadb client: %s', e2)
-                raise
+        client = _get_chroma_client(persist_dir)
 
         # Ensure collection exists
         try:
@@ -84,6 +174,11 @@ class VectorStore:
         self.client = client
         self.collection = collection
         self.collection_name = collection_name
+        try:
+            self.add_chunk_size = max(1, min(CHROMA_ADD_CHUNK, client.get_max_batch_size()))
+        except Exception:
+            # Clients without get_max_batch_size() accept any size
+            self.add_chunk_size = max(1, CHROMA_ADD_CHUNK)
         self.store_type = 'chroma'
 
     def _refresh_collection(self):
@@ -106,69 +201,119 @@ class VectorStore:
             logger.error('pinecone-client is required but not installed: %s', e)
             raise
 
-        api_key = os.getenv('PINECONE_API_KEY')
-        if not api_key:
+        if not PINECONE_API_KEY:
             raise ValueError('PINECONE_API_KEY environment variable is not set')
 
-        self.pc = Pinecone(api_key=api_key)
-        index_name = os.getenv('PINECONE_INDEX_NAME', 'website-docs')
+        self.pc = Pinecone(api_key=PINECONE_API_KEY)
+        index_name = PINECONE_INDEX_NAME
 
         # Check if index exists
         existing_indexes = [idx.name for idx in self.pc.list_indexes()]
         if index_name not in existing_indexes:
             # Create index
-            environment = os.getenv('PINECONE_ENVIRONMENT', 'us-east-1')
             self.pc.create_index(
                 name=index_name,
                 dimension=384,  # sentence-transformers all-MiniLM-L6-v2
                 metric='cosine',
-                spec={'serverless': {'cloud': 'aws', 'region': environment}}
+                spec={'serverless': {'cloud': 'aws', 'region': PINECONE_ENVIRONMENT}}
             )
             logger.info('Created Pinecone index: %s', index_name)
 
         self.index = self.pc.Index(index_name)
         logger.info('Connected to Pinecone index: %s', index_name)
 
+    @property
+    def partitioned(self) -> bool:
+        """True when each client's vectors live apart (Pinecone namespaces, or partitioned Chroma)."""
+        return self.store_type == 'pinecone' or CHROMA_PARTITION_BY_CLIENT
+
+    def get_collection(self, client_id: Optional[str]) -> 'VectorStore':
+        """Return a store scoped to one client's vectors; this store itself when not partitioned."""
+        if not client_id or self.client_id is not None or not self.partitioned:
+            return self
+
+        client_id = str(client_id)
+        with self._client_stores_lock:
+            store = self._client_stores.get(client_id)
+            if store is None:
+                store = copy.copy(self)
+                store.client_id = client_id
+                store._search_cache = SemanticSearchCache()
+                store._unscoped_search_cache = self._search_cache
+                if self.store_type == 'chroma':
+                    store.collection_name = client_collection_name(self.collection_name, client_id)
+                    store.collection = self.client.get_or_create_collection(
+                        name=store.collection_name,
+                        metadata={'description': 'Website content embeddings'}
+                    )
+                self._client_stores[client_id] = store
+        return store
+
+    def _clear_search_cache(self):
+        """Drop cached results that may miss or cite changed documents, including unscoped ones."""
+        self._search_cache.clear()
+        if self._unscoped_search_cache is not None:
+            self._unscoped_search_cache.clear()
+
+    def _partition_names(self) -> List[str]:
+        """Names of the per-client Chroma collections under this store's collection."""
+        prefix = self.collection_name + PARTITION_SEPARATOR
+        # Older Chroma releases return Collection objects, newer ones names
+        names = (getattr(c, 'name', c) for c in self.client.list_collections())
+        return [name for name in names if name.startswith(prefix)]
+
     def add_documents(
         self,
         documents: List[str],
-        embeddings: List[List[float]],
+        embeddings: Union[np.ndarray, List[List[float]]],
         metadatas: List[Dict],
         ids: List[str]
     ):
-        """Add documents with embeddings to vector store."""
+        """Add documents with embeddings (an (N, D) float32 array or list of vectors) to vector store."""
         if not documents:
             logger.warning('No documents to add')
             return
 
-        # Filter out any None embeddings
-        valid_items = [
-            (doc, emb, meta, id_)
-            for doc, emb, meta, id_ in zip(documents, embeddings, metadatas, ids)
-            if emb is not None
-        ]
+        # Arrays are passed through without per-row re-boxing
+        if isinstance(embeddings, np.ndarray):
+            if self.store_type == 'chroma':
+                self._add_to_chromadb(list(documents), embeddings, list(metadatas), list(ids))
+            elif self.store_type == 'pinecone':
+                self._add_to_pinecone(list(documents), embeddings.tolist(), list(metadatas), list(ids))
+            return
 
-        if not valid_items:
+        # Filter out any None embeddings, copying only when some are missing
+        keep = [i for i, emb in enumerate(embeddings) if emb is not None]
+        if not keep:
             logger.warning('No valid embeddings to add')
             return
-
-        documents, embeddings, metadatas, ids = zip(*valid_items)
+        if len(keep) < len(embeddings):
+            documents = [documents[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+            ids = [ids[i] for i in keep]
 
         if self.store_type == 'chroma':
-            self._add_to_chromadb(list(documents), list(embeddings), list(metadatas), list(ids))
+            # One contiguous matrix instead of a list of per-row lists
+            self._add_to_chromadb(list(documents), np.asarray(embeddings, dtype=np.float32), list(metadatas), list(ids))
         elif self.store_type == 'pinecone':
             self._add_to_pinecone(list(documents), list(embeddings), list(metadatas), list(ids))
 
     def _add_to_chromadb(self, documents, embeddings, metadatas, ids):
         """Add documents to ChromaDB."""
         try:
-            self.collection.add(
-                documents=documents,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
-            )
-            logger.info('Added %d documents to ChromaDB', len(documents))
+            # Bounded slices keep each write transaction (and its copy of
+            # the vectors) small on large inputs
+            size = self.add_chunk_size
+            for start in range(0, len(ids), size):
+                self.collection.add(
+                    documents=documents[start:start + size],
+                    embeddings=embeddings[start:start + size],
+                    metadatas=metadatas[start:start + size],
+                    ids=ids[start:start + size]
+                )
+            self._clear_search_cache()
+            logger.debug('Added %d documents to ChromaDB', len(documents))
         except Exception as e:
             logger.exception('Error adding documents to ChromaDB: %s', e)
             raise
@@ -176,50 +321,123 @@ class VectorStore:
     def _add_to_pinecone(self, documents, embeddings, metadatas, ids):
         """Add documents to Pinecone."""
         try:
-            vectors = []
-            namespace = None
-            for doc, emb, meta, id_ in zip(documents, embeddings, metadatas, ids):
-                # Pinecone expects metadata as key-value pairs
-                metadata = {k: v for k, v in meta.items() if isinstance(v, (str, int, float, bool))}
-                metadata['text'] = doc  # Store the document text in metadata
-
-                # Capture namespace for client isolation if present
-                if not namespace and isinstance(meta, dict) and meta.get('client_id'):
-                    namespace = str(meta.get('client_id'))
-
-                vectors.append({
-                    'id': id_,
-                    'values': emb,
-                    'metadata': metadata
-                })
-
-            # Use namespace (per-tenant) if provided for isolation
-            if namespace:
-                self.index.upsert(vectors=vectors, namespace=namespace)
+            # Pinecone expects flat key-value metadata; the document text rides along
+            vectors = [
+                {'id': id_, 'values': emb, 'metadata': {
+                    **{k: v for k, v in meta.items() if isinstance(v, PINECONE_METADATA_TYPES)},
+                    'text': doc
+                }}
+                for doc, emb, meta, id_ in zip(documents, embeddings, metadatas, ids)
+            ]
+
+            # Group by namespace (per-tenant isolation) so every request targets one
+            if self.client_id:
+                by_namespace = {self.client_id: vectors}
             else:
-                self.index.upsert(vectors=vectors)
-            logger.info('Added %d documents to Pinecone', len(documents))
+                by_namespace = {}
+                for meta, vector in zip(metadatas, vectors):
+                    client_id = meta.get('client_id')
+                    by_namespace.setdefault(str(client_id) if client_id else None, []).append(vector)
+
+            # Requests of PINECONE_UPSERT_BATCH vectors stay under Pinecone's
+            # request size limit and go out in parallel over the shared client
+            requests = [
+                (vectors[start:start + PINECONE_UPSERT_BATCH], namespace)
+                for namespace, vectors in by_namespace.items()
+                for start in range(0, len(vectors), PINECONE_UPSERT_BATCH)
+            ]
+            with ThreadPoolExecutor(max_workers=min(PINECONE_UPSERT_WORKERS, len(requests))) as pool:
+                futures = [
+                    pool.submit(self.index.upsert, vectors=batch, namespace=namespace)
+                    if namespace else pool.submit(self.index.upsert, vectors=batch)
+                    for batch, namespace in requests
+                ]
+                for future in futures:
+                    future.result()
+            self._clear_search_cache()
+            logger.debug('Added %d documents to Pinecone', len(documents))
         except Exception as e:
             logger.exception('Error adding documents to Pinecone: %s', e)
             raise
 
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = 5,
         where: Optional[Dict] = None
     ) -> Dict:
         """Search for similar documents."""
+        return self.search_batch([query_embedding], top_k, where)
+
+    def search_batch(
+        self,
+        query_embeddings: Union[np.ndarray, List[List[float]]],
+        top_k: int = 5,
+        where: Optional[Dict] = None
+    ) -> Dict:
+        """Search for several queries at once; row i of each result list belongs to query i.
+
+        Queries close enough to a recent one with the same top_k/where reuse
+        its results (see search_cache); only the rest reach the store.
+        """
+        if len(query_embeddings) == 0:
+            return _empty_results(0)
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        key = (top_k, json.dumps(where, sort_keys=True, default=str) if where else None)
+        rows = [self._search_cache.get(query, key) for query in queries]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            # A write that clears the cache mid-search makes these rows stale
+            generation = self._search_cache.generation
+            fresh = self._search_many(queries[missing], top_k, where)
+            for j, i in enumerate(missing):
+                rows[i] = {
+                    name: fresh[name][j] for name in RESULT_FIELDS
+                    if isinstance(fresh.get(name), list) and j < len(fresh[name])
+                }
+                # Empty rows may be a swallowed store error; never cache them
+                if rows[i].get('documents'):
+                    self._search_cache.put(queries[i], key, rows[i], generation)
+
+        return {name: [row[name] for row in rows] for name in RESULT_FIELDS if all(name in row for row in rows)}
+
+    def _search_many(self, queries: np.ndarray, top_k: int, where: Optional[Dict]) -> Dict:
+        """Run a query matrix against the store itself."""
         if self.store_type == 'chroma':
-            return self._search_chromadb(query_embedding, top_k, where)
+            if CHROMA_PARTITION_BY_CLIENT and self.client_id is None:
+                # Unscoped search spans every client, as it does on a shared collection
+                return self._search_partitions(queries, top_k, where)
+            # One query call scores the whole matrix
+            return self._search_chromadb(queries, top_k, where)
         elif self.store_type == 'pinecone':
-            return self._search_pinecone(query_embedding, top_k, where)
+            # Pinecone takes one vector per query request
+            merged = _empty_results(0)
+            for query_embedding in queries:
+                results = self._search_pinecone(query_embedding, top_k, where)
+                for key, rows in merged.items():
+                    rows.extend(results[key])
+            return merged
+
+    def _search_partitions(self, queries: np.ndarray, top_k: int, where: Optional[Dict]) -> Dict:
+        """Search the shared collection and every client collection, merging by distance."""
+        results = [self._search_chromadb(queries, top_k, where)]
+        for name in self._partition_names():
+            try:
+                results.append(self.client.get_collection(name).query(
+                    query_embeddings=queries,
+                    n_results=top_k,
+                    where=where
+                ))
+            except Exception as e:
+                logger.warning('Error searching ChromaDB collection %s: %s', name, e)
+        return _merge_by_distance(results, len(queries), top_k)
 
-    def _search_chromadb(self, query_embedding, top_k, where):
+    def _search_chromadb(self, query_embeddings, top_k, where):
         """Search ChromaDB."""
         try:
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=query_embeddings,
                 n_results=top_k,
                 where=where
             )
@@ -231,7 +449,7 @@ class VectorStore:
                 self._refresh_collection()
                 try:
                     results = self.collection.query(
-                        query_embeddings=[query_embedding],
+                        query_embeddings=query_embeddings,
                         n_results=top_k,
                         where=where
                     )
@@ -240,7 +458,7 @@ class VectorStore:
                     logger.exception('Error searching ChromaDB after refresh: %s', retry_e)
             else:
                 logger.exception('Error searching ChromaDB: %s', e)
-            return {'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+            return _empty_results(len(query_embeddings))
 
     def _search_pinecone(self, query_embedding, top_k, where):
         """Search Pinecone."""
@@ -254,34 +472,42 @@ class VectorStore:
                 if 'client_id' in where_copy:
                     namespace = where_copy.pop('client_id')
                 filter_dict = where_copy if where_copy else None
+            if namespace is None:
+                namespace = self.client_id
 
             results = self.index.query(
-                vector=query_embedding,
+                vector=query_embedding.tolist() if isinstance(query_embedding, np.ndarray) else query_embedding,
                 top_k=top_k,
                 filter=filter_dict,
                 include_metadata=True,
                 namespace=namespace
             )
 
-            # Convert Pinecone results to ChromaDB-like format for compatibility
-            documents = [[match.metadata.get('text', '') for match in results.matches]]
-            metadatas = [[{k: v for k, v in match.metadata.items() if k != 'text'} for match in results.matches]]
-            distances = [[match.score for match in results.matches]]
+            # Convert Pinecone results to ChromaDB-like format for compatibility, in one pass
+            documents, metadatas, distances = [], [], []
+            for match in results.matches:
+                metadata = dict(match.metadata)
+                documents.append(metadata.pop('text', ''))
+                metadatas.append(metadata)
+                distances.append(match.score)
 
             return {
-                'documents': documents,
-                'metadatas': metadatas,
-                'distances': distances
+                'documents': [documents],
+                'metadatas': [metadatas],
+                'distances': [distances]
             }
         except Exception as e:
             logger.exception('Error searching Pinecone: %s', e)
-            return {'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+            return _empty_results(1)
 
     def count(self) -> int:
         """Get count of documents in collection/index."""
         if self.store_type == 'chroma':
             try:
-                return int(self.collection.count())
+                total = int(self.collection.count())
+                if CHROMA_PARTITION_BY_CLIENT and self.client_id is None:
+                    total += sum(int(self.client.get_collection(name).count()) for name in self._partition_names())
+                return total
             except Exception as e:
                 # Handle stale collection reference
                 if 'does not exist' in str(e).lower() or 'NotFoundError' in type(e).__name__:
@@ -294,6 +520,9 @@ class VectorStore:
         elif self.store_type == 'pinecone':
             try:
                 stats = self.index.describe_index_stats()
+                if self.client_id is not None:
+                    namespace = stats.namespaces.get(self.client_id)
+                    return namespace.vector_count if namespace else 0
                 return stats.total_vector_count
             except Exception as e:
                 logger.exception('Error getting Pinecone count: %s', e)
@@ -309,9 +538,8 @@ class VectorStore:
                 logger.exception('Error deleting ChromaDB collection: %s', e)
         elif self.store_type == 'pinecone':
             try:
-                index_name = os.getenv('PINECONE_INDEX_NAME', 'website-docs')
-                self.pc.delete_index(index_name)
-                logger.info('Deleted Pinecone index: %s', index_name)
+                self.pc.delete_index(PINECONE_INDEX_NAME)
+                logger.info('Deleted Pinecone index: %s', PINECONE_INDEX_NAME)
             except Exception as e:
                 logger.exception('Error deleting Pinecone index: %s', e)
 
@@ -319,6 +547,10 @@ class VectorStore:
         """Reset the collection/index (delete and recreate)."""
         if self.store_type == 'chroma':
             collection_name = self.collection.name
+            if CHROMA_PARTITION_BY_CLIENT and self.client_id is None:
+                for name in self._partition_names():
+                    self.client.delete_collection(name)
+                    logger.info('Deleted ChromaDB collection: %s', name)
             self.delete_collection()
             self.collection = self.client.create_collection(
                 name=collection_name,
@@ -326,19 +558,23 @@ class VectorStore:
             )
             logger.info('Reset ChromaDB collection: %s', collection_name)
         elif self.store_type == 'pinecone':
-            index_name = os.getenv('PINECONE_INDEX_NAME', 'website-docs')
-            environment = os.getenv('PINECONE_ENVIRONMENT', 'us-east-1')
+            index_name = PINECONE_INDEX_NAME
             self.delete_collection()
             # Recreate the index
             self.pc.create_index(
                 name=index_name,
                 dimension=384,
                 metric='cosine',
-                spec={'serverless': {'cloud': 'aws', 'region': environment}}
+                spec={'serverless': {'cloud': 'aws', 'region': PINECONE_ENVIRONMENT}}
             )
             self.index = self.pc.Index(index_name)
             logger.info('Reset Pinecone index: %s', index_name)
 
+        # Per-client views hold references to the dropped collections/index
+        with self._client_stores_lock:
+            self._client_stores.clear()
+        self._search_cache.clear()
+
     def delete_documents(self, where: Dict):
         """Delete documents from vector store based on metadata filter."""
         if not where:
@@ -352,17 +588,34 @@ class VectorStore:
             elif self.store_type == 'pinecone':
                 # Try delete by metadata (works on serverless indexes)
                 try:
-                    self.index.delete(filter=where)
+                    self.index.delete(filter=where, namespace=self.client_id)
                     logger.info("Deleted documents from Pinecone matching: %s", where)
                 except Exception as e:
                     logger.warning("Pinecone metadata deletion failed: %s", e)
         except Exception as e:
             logger.error("Error deleting documents: %s", e)
             raise
+        finally:
+            # Cached results may cite the deleted documents
+            self._clear_search_cache()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide VectorStore, shared by chat, ingestion and the API routes."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VectorStore()
+    return _store
 
 
 # Usage example
 if __name__ == '__main__':
-    store = VectorStore()
+    store = get_vector_store()
     print(f'Store type: {store.store_type}')
     print(f'Current document count: {store.count()}')
@@ -0,0 +1,48 @@
+import unittest
+
+import tiktoken
+
+from backend.data_ingestion.chunker import TextChunker
+
+
+def _byte_level_encoding() -> tiktoken.Encoding:
+    """Offline encoding with one token per byte plus a few merges, so tokens split characters."""
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in (b"th", b"he", b"the", b"\xe6\x97", b"\xf0\x9f"):
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding(
+        name="test_bytes",
+        pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+
+
+class TokenChunkTests(unittest.TestCase):
+    def setUp(self):
+        self.chunker = TextChunker(chunk_size=7, chunk_overlap=3)
+        self.chunker.encoding = _byte_level_encoding()
+
+    def assertMatchesDecode(self, text):
+        encoding = self.chunker.encoding
+        tokens = encoding.encode(text)
+        step = self.chunker.chunk_size - self.chunker.chunk_overlap
+        chunks = self.chunker.chunk_text(text)
+        windows = [tokens[start:start + self.chunker.chunk_size] for start in range(0, len(tokens), step)]
+        self.assertEqual([c['text'] for c in chunks], [encoding.decode(w) for w in windows])
+        self.assertEqual([c['token_count'] for c in chunks], [len(w) for w in windows])
+
+    def test_ascii(self):
+        self.assertMatchesDecode("The quick brown fox jumps over the lazy dog. " * 5)
+
+    def test_multibyte_characters_across_window_boundaries(self):
+        # CJK, accents and emoji are split over several tokens, so windows cut through characters
+        self.assertMatchesDecode("naïve café 日本語のテキスト 😀🎉 多字节字符 ñandú " * 4)
+
+    def test_lone_and_paired_surrogates(self):
+        # A lone surrogate each way, and a pair that tiktoken joins into one character
+        self.assertMatchesDecode("page one \ud800 text \udfff more \ud83d\ude00 end " * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
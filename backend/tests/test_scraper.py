@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+
+from backend.data_ingestion.scraper import WebScraper
+
+
+class _FakeCrawlScraper(WebScraper):
+    """Emits a fixed number of pages without touching the network."""
+
+    def __init__(self, page_count: int):
+        super().__init__("https://example.com", max_pages=page_count)
+        self.page_count = page_count
+
+    async def crawl(self, on_page=None):
+        pages = []
+        for i in range(self.page_count):
+            await on_page({"url": f"https://example.com/{i}", "title": str(i), "content": "text"})
+            pages.append(i)
+        return pages
+
+
+class _FakeSiteScraper(WebScraper):
+    """Serves a site where every page links to ten more, without the network."""
+
+    def __init__(self, max_pages: int):
+        super().__init__("https://example.com", max_pages=max_pages, max_depth=5, session=object())
+
+    async def _fetch(self, url):
+        links = ''.join(f'<a href="{url.rstrip("/")}/{i}">link</a>' for i in range(10))
+        return f"<html><head><title>{url}</title></head><body><p>content</p>{links}</body></html>"
+
+
+def _pending_tasks():
+    current = asyncio.current_task()
+    return [task for task in asyncio.all_tasks() if task is not current and not task.done()]
+
+
+class CrawlIterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_break_after_one_page_leaves_no_pending_tasks(self):
+        pages = _FakeCrawlScraper(page_count=100).crawl_iter()
+        try:
+            async for page in pages:
+                self.assertEqual(page["url"], "https://example.com/0")
+                break
+        finally:
+            await asyncio.wait_for(pages.aclose(), timeout=2)
+        await asyncio.sleep(0)
+        self.assertEqual(_pending_tasks(), [])
+
+    async def test_yields_every_page_when_queue_fills(self):
+        # More pages than the queue holds, consumed slowly so the sentinel meets a full queue
+        received = []
+        async for page in _FakeCrawlScraper(page_count=40).crawl_iter():
+            received.append(page["url"])
+            await asyncio.sleep(0)
+        self.assertEqual(len(received), 40)
+        self.assertEqual(_pending_tasks(), [])
+
+
+    async def test_streamed_crawl_keeps_no_pages_and_honours_max_pages(self):
+        scraper = _FakeSiteScraper(max_pages=7)
+        received = []
+
+        async def on_page(page):
+            received.append(page["url"])
+            await asyncio.sleep(0)
+
+        self.assertEqual(await scraper.crawl(on_page=on_page), [])
+        self.assertEqual(len(received), 7)
+
+    async def test_collected_crawl_returns_pages(self):
+        pages = await _FakeSiteScraper(max_pages=5).crawl()
+        self.assertEqual(len(pages), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
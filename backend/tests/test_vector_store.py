@@ -0,0 +1,117 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from backend.services import vector_store
+from backend.services.search_cache import SemanticSearchCache
+
+
+class _FakeCollection:
+    """Chroma collection stand-in scoring by squared L2 distance."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+
+    def add(self, documents, embeddings, metadatas, ids):
+        for doc, emb, meta, id_ in zip(documents, embeddings, metadatas, ids):
+            self.rows[id_] = (doc, np.asarray(emb, dtype=np.float32), meta)
+
+    def count(self):
+        return len(self.rows)
+
+    def query(self, query_embeddings, n_results, where=None):
+        out = {name: [] for name in vector_store.RESULT_FIELDS}
+        for query in np.asarray(query_embeddings, dtype=np.float32):
+            hits = sorted(
+                (float(np.sum((emb - query) ** 2)), id_, doc, meta)
+                for id_, (doc, emb, meta) in self.rows.items()
+            )[:n_results]
+            out['distances'].append([h[0] for h in hits])
+            out['ids'].append([h[1] for h in hits])
+            out['documents'].append([h[2] for h in hits])
+            out['metadatas'].append([h[3] for h in hits])
+        return out
+
+
+class _FakeChromaClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None):
+        return self.collections.setdefault(name, _FakeCollection(name))
+
+    get_collection = get_or_create_collection
+
+    def list_collections(self):
+        return list(self.collections)
+
+
+def _partitioned_store():
+    store = object.__new__(vector_store.VectorStore)
+    store.store_type = 'chroma'
+    store.client_id = None
+    store._client_stores = {}
+    store._client_stores_lock = vector_store.threading.Lock()
+    store._search_cache = SemanticSearchCache()
+    store._unscoped_search_cache = None
+    store.client = _FakeChromaClient()
+    store.collection_name = 'docs'
+    store.collection = store.client.get_or_create_collection('docs')
+    store.add_chunk_size = 100
+    return store
+
+
+class PartitionedSearchTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(vector_store, 'CHROMA_PARTITION_BY_CLIENT', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = _partitioned_store()
+        self.store.get_collection('acme').add_documents(
+            ['acme far', 'acme near'], np.array([[0, 1], [1, 0.1]], dtype=np.float32),
+            [{'client_id': 'acme'}, {'client_id': 'acme'}], ['a1', 'a2'])
+        self.store.get_collection('globex').add_documents(
+            ['globex nearest'], np.array([[1, 0]], dtype=np.float32),
+            [{'client_id': 'globex'}], ['g1'])
+
+    def test_unscoped_search_spans_every_partition(self):
+        results = self.store.search(np.array([1, 0], dtype=np.float32), top_k=2)
+        self.assertEqual(results['documents'], [['globex nearest', 'acme near']])
+        self.assertEqual(self.store.count(), 3)
+
+    def test_scoped_search_stays_in_its_partition(self):
+        results = self.store.get_collection('acme').search(np.array([1, 0], dtype=np.float32), top_k=5)
+        self.assertEqual(results['documents'], [['acme near', 'acme far']])
+
+    def test_partition_write_invalidates_unscoped_cache(self):
+        query = np.array([1, 0], dtype=np.float32)
+        self.store.search(query, top_k=1)
+        self.store.get_collection('initech').add_documents(
+            ['initech exact'], np.array([[1, 0]], dtype=np.float32),
+            [{'client_id': 'initech'}], ['i1'])
+        # Tie on distance with globex; either is valid, but the stale cached row is not
+        results = self.store.search(query, top_k=2)
+        self.assertIn('initech exact', results['documents'][0])
+
+
+class SearchCacheGenerationTests(unittest.TestCase):
+    def test_rows_from_before_a_clear_are_not_cached(self):
+        store = _partitioned_store()
+        store.add_documents(['doc'], np.array([[1, 0]], dtype=np.float32), [{}], ['d1'])
+        search_many = store._search_many
+
+        def search_then_write(*args):
+            results = search_many(*args)
+            store._clear_search_cache()  # a write lands while the search is in flight
+            return results
+
+        query = np.array([1, 0], dtype=np.float32)
+        with mock.patch.object(store, '_search_many', side_effect=search_then_write):
+            store.search(query, top_k=1)
+        self.assertIsNone(store._search_cache.get(query, (1, None)))
+
+
+if __name__ == '__main__':
+    unittest.main()
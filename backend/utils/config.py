@@ -18,10 +18,12 @@ class Config:
     # API Configuration
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    RELOAD: bool = os.getenv("RELOAD", "False").lower() == "true"
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
 
     # LLM Configuration
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "groq")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
     OPENAI_EMBEDDING_MODEL: str = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
@@ -52,8 +54,10 @@ class Config:
     SCRAPE_DEPTH: int = int(os.getenv("SCRAPE_DEPTH", "3"))
 
     # Security
+    ENABLE_AUTH: bool = os.getenv("ENABLE_AUTH", "True").lower() == "true"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change-this-in-production")
-    CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:8000")
+    CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:8000,http://localhost:5173")
+    CORS_ORIGIN_LIST: tuple = tuple(o.strip() for o in CORS_ORIGINS.split(",") if o.strip())
 
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -2,9 +2,12 @@
 Logging configuration.
 """
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 from pathlib import Path
+from typing import Iterable
 
 
 def setup_logger(name: str = "chatbot", level: str = None) -> logging.Logger:
@@ -63,6 +66,46 @@ def setup_logger(name: str = "chatbot", level: str = None) -> logging.Logger:
     return logger
 
 
+# (logger, queue handler, listener) triples installed by enable_queue_logging
+_queue_logging = []
+
+
+def enable_queue_logging(logger_names: Iterable[str] = ("", "uvicorn", "uvicorn.access")) -> None:
+    """
+    Move the handlers of the given loggers behind a QueueHandler so log
+    formatting and stream writes happen on a background thread instead of
+    the event loop.
+
+    Args:
+        logger_names: Loggers whose handlers should be moved ("" is root)
+    """
+    for name in logger_names:
+        target = logging.getLogger(name)
+        handlers = [h for h in target.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+        if not handlers:
+            continue
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        for handler in handlers:
+            target.removeHandler(handler)
+        target.addHandler(queue_handler)
+
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _queue_logging.append((target, queue_handler, listener))
+
+
+def disable_queue_logging() -> None:
+    """Flush queued records and restore the original handlers."""
+    while _queue_logging:
+        target, queue_handler, listener = _queue_logging.pop()
+        listener.stop()
+        target.removeHandler(queue_handler)
+        for handler in listener.handlers:
+            target.addHandler(handler)
+
+
 # Create default logger
 logger = setup_logger()
 
@@ -0,0 +1,11 @@
+"""
+Timestamp helpers.
+"""
+from datetime import datetime, timezone
+
+_ISO_UTC_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO-8601 string with a trailing 'Z'."""
+    return datetime.now(timezone.utc).strftime(_ISO_UTC_FORMAT)
@@ -0,0 +1,3 @@
+"""
+Background worker package for out-of-process ingestion.
+"""
@@ -0,0 +1,32 @@
+"""
+Celery application for running ingestion jobs outside the API process.
+
+Used when CELERY_BROKER_URL is set. Start workers alongside Uvicorn with:
+
+    celery -A backend.workers.celery_app worker -c 4
+"""
+import os
+
+from celery import Celery
+
+BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+
+celery_app = Celery(
+    "ingestion",
+    broker=BROKER_URL,
+    backend=os.getenv("CELERY_RESULT_BACKEND", BROKER_URL)
+)
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    # Re-deliver a job if the worker dies mid-run
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+)
+
+
+@celery_app.task(bind=True, name="ingestion.run")
+def run_ingestion_task(self, job_id: str, url: str, max_pages: int, max_depth: int, reset: bool, client_id: str | None = None, files: list[str] | None = None):
+    """Run one ingestion job on the worker."""
+    from backend.api.routes.ingestion import run_ingestion_task_sync
+    run_ingestion_task_sync(job_id, url, max_pages, max_depth, reset, client_id, files)
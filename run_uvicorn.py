@@ -10,6 +10,16 @@ import os
 # Set Windows event loop policy before importing anything else
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    LOOP = "auto"
+else:
+    # Use uvloop on Linux/macOS; recent Uvicorn ignores the global policy,
+    # so the loop is also passed explicitly to uvicorn.run below.
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        LOOP = "uvloop"
+    except ImportError:
+        LOOP = "auto"
 
 from dotenv import load_dotenv
 
@@ -30,6 +40,7 @@ def main():
     print(f"Host: {host}")
     print(f"Port: {port}")
     print(f"Reload: {reload}")
+    print(f"Loop: {LOOP}")
     print(f"Docs: http://localhost:{port}/docs")
     print("=" * 60)
     
@@ -37,7 +48,8 @@ def main():
         "backend.api.main:app",
         host=host,
         port=port,
-        reload=reload
+        reload=reload,
+        loop=LOOP
     )
 
 